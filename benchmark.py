@@ -0,0 +1,55 @@
+import argparse
+import sys
+import time
+import main
+
+# Run the whole max-flow computation once and collect its job counters
+def measure(graph_file, environment, job_args):
+    counters = {}
+    start = time.time()
+    max_flow = main.run(graph_file, environment, job_args, counters)
+    elapsed = time.time() - start
+    return max_flow, elapsed, counters
+
+def print_row(name, max_flow, elapsed, counters):
+    # Records and bytes that actually reach the shuffle, with or without the combiner
+    shuffle = counters.get("shuffle", {})
+    stage = "combiner" if "combiner records" in shuffle else "mapper"
+    print("%-12s max_flow=%-8s time=%8.2fs rounds=%-4d mapper_records=%-10d shuffle_records=%-10d shuffle_bytes=%d" % (
+        name, max_flow, elapsed, counters.get("driver", {}).get("rounds", 0), shuffle.get("mapper records", 0),
+        shuffle.get(stage + " records", 0), shuffle.get(stage + " bytes", 0)))
+
+def compare_combiner(graph_file, environment, args):
+    for name, job_args in [("no-combiner", ["--no-combiner"]), ("combiner", [])]:
+        max_flow, elapsed, counters = measure(graph_file, environment, job_args + ["--shuffle-stats"])
+        print_row(name, max_flow, elapsed, counters)
+
+def compare_rounds_per_job(graph_file, environment, args):
+    # Total runtime for several numbers of rounds chained in one job
+    for k in args.rounds:
+        max_flow, elapsed, counters = measure(graph_file, environment, ["--rounds-per-job", str(k), "--shuffle-stats"])
+        print_row("K=%d" % k, max_flow, elapsed, counters)
+
+def compare_path_budget(graph_file, environment, args):
+    # Rounds against shuffle size for the fixed budget and the per vertex budgets
+    for max_paths in args.max_paths:
+        max_flow, elapsed, counters = measure(graph_file, environment, ["--max-paths", str(max_paths), "--shuffle-stats"])
+        print_row("fixed=%d" % max_paths, max_flow, elapsed, counters)
+    for policy in ["degree", "residual"]:
+        max_flow, elapsed, counters = measure(graph_file, environment, ["--path-budget", policy, "--shuffle-stats"])
+        print_row(policy, max_flow, elapsed, counters)
+
+EXPERIMENTS = {"combiner": compare_combiner, "rounds": compare_rounds_per_job, "budget": compare_path_budget}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare Map-Reduce max-flow settings on one graph")
+    parser.add_argument("graph_file")
+    parser.add_argument("environment", choices=["local", "cloud", "inprocess"])
+    parser.add_argument("experiment", nargs="?", choices=sorted(EXPERIMENTS), default="combiner")
+    parser.add_argument("--rounds", type=int, nargs="+", default=[1, 2, 4, 8], metavar="K",
+                        help="rounds per job compared by the rounds experiment")
+    parser.add_argument("--max-paths", type=int, nargs="+", default=[5, 10, 20], metavar="N",
+                        help="fixed budgets compared by the budget experiment")
+    args = parser.parse_args(sys.argv[1:])
+
+    EXPERIMENTS[args.experiment](args.graph_file, args.environment, args)
@@ -0,0 +1,67 @@
+import json
+import os
+import shutil
+
+### Round checkpoints of a max-flow run ###
+# A checkpoint is a directory named after the number of rounds done, holding
+# the vertex records and the augmented edges side file the next job reads, both
+# in the protocol of the run, and state.json with the flow on every edge.
+# It is written under a .tmp name and renamed once complete, so a directory
+# without the suffix is always a whole checkpoint.
+
+VERTICES_FILE = "vertices.txt"
+AUGMENTED_FILE = "augmented.txt"
+STATE_FILE = "state.json"
+
+class Checkpoints:
+    def __init__(self, directory, keep=2):
+        # the checkpoint just written is always kept, a resume needs it
+        if keep < 1:
+            raise ValueError("at least one checkpoint has to be kept, not %d" % keep)
+        self.directory = directory
+        self.keep = keep
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def path(self, rounds):
+        return os.path.join(self.directory, "round-%06d" % rounds)
+
+    # complete checkpoints, oldest first
+    def complete(self):
+        names = [name for name in os.listdir(self.directory)
+                 if name.startswith("round-") and not name.endswith(".tmp")]
+        return [os.path.join(self.directory, name) for name in sorted(names)]
+
+    def latest(self):
+        checkpoints = self.complete()
+        return checkpoints[-1] if len(checkpoints) > 0 else None
+
+    # write_files(directory) writes the vertex records and the augmented edges
+    # into the checkpoint directory before it is renamed
+    def save(self, rounds, state, write_files):
+        final_path = self.path(rounds)
+        temp_path = final_path + ".tmp"
+        if os.path.exists(temp_path):
+            shutil.rmtree(temp_path)
+        os.makedirs(temp_path)
+
+        write_files(temp_path)
+        state_file = open(os.path.join(temp_path, STATE_FILE), "w")
+        json.dump(dict(state, rounds=rounds), state_file)
+        state_file.flush()
+        os.fsync(state_file.fileno())
+        state_file.close()
+
+        if os.path.exists(final_path):
+            shutil.rmtree(final_path)
+        os.rename(temp_path, final_path)
+
+        # keep only the newest checkpoints
+        for old_path in self.complete()[:-self.keep]:
+            shutil.rmtree(old_path)
+
+def read_state(checkpoint_path):
+    state_file = open(os.path.join(checkpoint_path, STATE_FILE), "r")
+    state = json.load(state_file)
+    state_file.close()
+    return state
@@ -1,133 +1,459 @@
-import mrjob.job, mrjob.protocol, mrjob.step, sys
+import mrjob.job, mrjob.protocol, mrjob.step, sys, binascii, marshal, zlib
 
 class Accumulator:
     def __init__(self):
         self.edges = dict()
 
+    # edge[0] = destination vertex
+    # edge[1] = dense integer edge id
+    # edge[2] = flow on edge
+    # edge[3] = capacity of edge
+    # paths are chains of nodes, see extend_path
+
+    # residue of a path after the flow already accepted on its edges,
+    # non positive as soon as one edge has no residue left.
+    # capacities can be any int or float, including float("inf")
+    def bottleneck(self, path):
+        edges = self.edges
+        min_flow = float("inf")
+
+        for edge in path_edges(path):
+            # residue = (capacity) - (flow on edge) - (accumulated_flow)
+            residue = edge[3] - edge[2] - edges.get(edge[1], 0)
+            if residue <= 0:
+                return residue
+            if residue < min_flow:
+                min_flow = residue
+
+        return min_flow
+
     def accept(self, augmenting_path):
-        # assume path is valid, set min_flow to a big number
-        valid_path, min_flow = (True, 1000000)
-
-        # edge[0] = destination vertex
-        # edge[1] = edge_id (vertex1_id, vertex2_id)
-        # edge[2] = flow on edge
-        # edge[3] = capacity of edge
-
-        for edge in augmenting_path:
-            # attempt to get edge flow by id
-            edge_option = self.edges.get(edge[1], None)
-
-            if edge_option == None:
-                # if edge isn't already in path, init flow to 0
-                accumulated_flow = 0
-            else:
-                # else init flow to existing flow
-                accumulated_flow = edge_option
-
-            # set residue to (capacity) - (accumulated_flow) - (flow on edge)
-            residue = edge[3]
-            residue -= accumulated_flow
-            residue -= edge[2]
-
-            # if residue is non positive, augmenting path is invalid
-            valid_path = False if residue <= 0 else valid_path
-            # if residue is positive and smaller than min_flow on path, set min_flow to residue
-            min_flow = residue if (residue > 0 and residue < min_flow) else min_flow
-
-        if (valid_path == False):
-            # reject path if invalid
+        min_flow = self.bottleneck(augmenting_path)
+
+        # reject path if an edge is saturated
+        if min_flow <= 0:
             return False
-        else:
-            for edge in augmenting_path:
-                # check if edge is already in path
-                id_option = self.edges.get(edge[1], None)
-                # if it is not, set flow on edge to min_flow
-                # else set flow on edge to (flow on edge + min_flow)
-                self.edges[edge[1]] = self.edges[edge[1]] + min_flow if id_option != None else min_flow
-            return True
 
-# accumulators don't accept more source excess paths than this
-MAX_PATHS = 10
+        # add min_flow to the accumulated flow of every edge on the path
+        edges = self.edges
+        for edge in path_edges(augmenting_path):
+            edges[edge[1]] = edges.get(edge[1], 0) + min_flow
+        return True
 
-### helpers for map function ###
+    # accept or reject many candidate paths at once and return the accepted ones,
+    # at most limit of them. augmenting paths are tried widest bottleneck first,
+    # excess paths keep their order so the paths a vertex keeps don't churn
+    # from round to round while the search is settling
+    def accept_all(self, paths, limit=None, widest_first=True):
+        accepted = list()
 
-# check cycle before adding a new edge to path
-def edge_forms_cycle(new_edge, path):
-    return any(map(lambda edge: edge[0] == new_edge[0], path))
+        if widest_first:
+            paths = sorted(paths, key=self.bottleneck, reverse=True)
 
-# update flow of edge in augmented_edges
-# add edge to saturated_edges if flow >= capacity
-def update_edge(edge, augmented_edges, saturated_edges):
-    edge_option = augmented_edges.get(edge[1], None)
+        for path in paths:
+            if limit != None and len(accepted) >= limit:
+                break
+            if self.accept(path):
+                accepted.append(path)
 
-    if edge_option != None:
-        edge[2] = edge[2] + augmented_edges[edge[1]]
+        return accepted
 
-    if edge_option!= None and edge[2] >= edge[3] and saturated_edges.count(edge[1]) == 0:
-        saturated_edges.append(edge[1])
+# accumulators don't accept more source excess paths than this
+MAX_PATHS = 10
+
+# upper bound of the per vertex budgets, a hub never keeps more excess paths than this
+MAX_PATH_BUDGET = 40
+
+# policies selectable with --path-budget, fixed keeps MAX_PATHS for every vertex
+PATH_BUDGETS = ("fixed", "degree", "residual")
+
+# vertices and edges are dense integer ids assigned by the driver,
+# the source and sink always get the first two vertex ids
+SOURCE, SINK = 0, 1
+
+# key of the reducer output holding the total flow of the edges augmented in a job as [edge_id, flow] pairs
+AUGMENTED_KEY = -1
+
+### excess paths ###
+
+# an excess path is a chain of shared nodes: a node is the edge at the open end
+# of the path with one more item, node[4], the node of the rest of the path
+# (None for a single edge). a source excess path grows at its end and a sink
+# excess path at its start, both without copying the rest of the path, which
+# stays shared with every other extension of it. augmenting paths are chains
+# from s to t as well, a full list of edges is never built.
+
+# add an edge to the open end of a path, path is None for a new path
+def extend_path(path, edge):
+    return [edge[0], edge[1], edge[2], edge[3], path]
+
+# nodes of a path, from its open end back to its first edge,
+# every node can be used as the edge it holds
+def path_edges(path):
+    while path != None:
+        yield path
+        path = path[4]
+
+# edge ids of a path, equal for the same path whatever the flow on its edges
+def path_key(path):
+    return tuple(edge[1] for edge in path_edges(path))
+
+# drop the paths that are already in the list
+def unique_paths(paths):
+    keys = set()
+    unique = list()
+    for path in paths:
+        key = path_key(path)
+        if key not in keys:
+            keys.add(key)
+            unique.append(path)
+    return unique
+
+# join a source excess path ending at a vertex and a sink excess path starting there
+def join_paths(source_path, sink_path):
+    path = source_path
+    for edge in path_edges(sink_path):
+        path = extend_path(path, edge)
+    return path
+
+# excess paths leave a task as a table of nodes and the index of the open end of
+# every path. a node of the table is [destination, edge id, flow, capacity, parent],
+# parent is the index of the node of the rest of the path (-1 for none) and always
+# comes first. the chains are as long as the paths, encoders that recurse into
+# nested lists (pickle, json, marshal) overflow on them, the table is two levels deep
+# whatever the length of the paths. nodes shared by several paths are written once.
+def pack_paths(paths):
+    index = dict()
+    nodes = list()
+    heads = list()
+
+    for path in paths:
+        # walk back to the first node that is already in the table
+        chain = list()
+        node = path
+        while node != None and id(node) not in index:
+            chain.append(node)
+            node = node[4]
+        parent = index[id(node)] if node != None else -1
+
+        for node in reversed(chain):
+            index[id(node)] = len(nodes)
+            nodes.append([node[0], node[1], node[2], node[3], parent])
+            parent = len(nodes) - 1
+        heads.append(parent)
+
+    return [nodes, heads]
+
+# rebuild the chains of a table written by pack_paths
+def unpack_paths(packed):
+    nodes, heads = packed
+    chains = list()
+    for node in nodes:
+        chains.append(extend_path(chains[node[4]] if node[4] >= 0 else None, node))
+    return [chains[head] for head in heads]
+
+# a vertex record or message with its excess paths packed, or rebuilt
+def pack_value(value):
+    return [pack_paths(value[0]), pack_paths(value[1])] + list(value[2:])
+
+def unpack_value(value):
+    return [unpack_paths(value[0]), unpack_paths(value[1])] + list(value[2:])
+
+# tail vertex and node of every edge on an augmenting path, from s to t.
+# a path joined at a vertex has its open end at t, a sink excess path
+# that grew back to s has it at s
+def path_tails(path):
+    nodes = list(path_edges(path))
+    if path[0] == SINK:
+        nodes.reverse()
+
+    tail = SOURCE
+    for node in nodes:
+        yield tail, node
+        tail = node[0]
+
+### helpers for map function ###
+
+# destination vertices of the edges on a path, built once per excess path
+# so checking an extension for a cycle is a set lookup instead of a walk.
+# the set is not kept in the path: it would go through the shuffle with every
+# node and compresses far worse than the edges, rebuilding it is one walk
+def path_vertices(path):
+    return set(edge[0] for edge in path_edges(path))
+
+# set the flow of edge to the one in augmented_edges
+# augmented_edges holds the total flow of an edge, not what a round added to it,
+# so a copy of an edge that already has it is left as it is
+# edges are never changed in place, lists may be shared between records
+# (the in-process engine hands them over without serializing),
+# so an augmented edge is returned as a new list
+def update_edge(edge, augmented_edges):
+    flow = augmented_edges.get(edge[1], None)
+
+    if flow == None or flow == edge[2]:
+        return edge
+
+    return [edge[0], edge[1], flow, edge[3]]
+
+# update the edges of excess paths according to augmented edges
+# and keep only the paths without a saturated edge.
+# every copy of an edge gets the same flow, so a path is saturated
+# exactly when one of its own edges becomes saturated.
+# nodes shared by several paths are updated once: updated maps the id of
+# a node to its updated node, or to False when the node's chain is saturated
+def update_paths(paths, augmented_edges):
+    updated = dict()
+    live_paths = list()
+
+    for path in paths:
+        # walk back to the first node that is already updated
+        nodes = list()
+        node = path
+        while node != None and id(node) not in updated:
+            nodes.append(node)
+            node = node[4]
+        new_path = updated[id(node)] if node != None else None
+
+        # rebuild the chain from there, a node is only copied when its
+        # edge or the rest of its path changed
+        for node in reversed(nodes):
+            if new_path is not False:
+                edge = update_edge(node, augmented_edges)
+                if edge[2] >= edge[3]:
+                    new_path = False
+                elif edge is node and new_path is node[4]:
+                    new_path = node
+                else:
+                    new_path = extend_path(new_path, edge)
+            updated[id(node)] = new_path
+
+        if new_path is not False:
+            live_paths.append(new_path)
+
+    return live_paths
+
+### protocols for vertex records ###
+
+# key and value are written as base64 of marshal (zlib compressed for the value),
+# separated by a tab so Hadoop can still split the key off a line.
+# marshal format 2 has no object references, so equal keys always encode to
+# equal bytes and shared lists are never aliased after decoding.
+class CompactProtocol:
+    MARSHAL_VERSION = 2
+
+    def read(self, line):
+        key, value = line.split(b"\t", 1)
+        key = marshal.loads(binascii.a2b_base64(key))
+        value = marshal.loads(zlib.decompress(binascii.a2b_base64(value)))
+        return key, value
+
+    def write(self, key, value):
+        key = binascii.b2a_base64(marshal.dumps(key, self.MARSHAL_VERSION), newline=False)
+        value = zlib.compress(marshal.dumps(value, self.MARSHAL_VERSION), 1)
+        return key + b"\t" + binascii.b2a_base64(value, newline=False)
+
+# protocols selectable with --protocol, json is kept for debugging
+PROTOCOLS = {"compact": CompactProtocol, "json": mrjob.protocol.JSONProtocol}
 
 ### MRJob job definition ###
 class MRFlow(mrjob.job.MRJob):
     OUTPUT_PROTOCOL, INPUT_PROTOCOL = (mrjob.protocol.JSONProtocol, mrjob.protocol.JSONProtocol)
 
+    def configure_args(self):
+        super(MRFlow, self).configure_args()
+        self.add_passthru_arg('--protocol', choices=sorted(PROTOCOLS), default='json',
+                              help='encoding of vertex records between rounds and in the shuffle')
+        self.add_file_arg('--augmented-edges',
+                          help='file with the AUGMENTED_KEY record of the previous round')
+        self.add_passthru_arg('--no-combiner', dest='combiner', action='store_false', default=True,
+                              help='send every excess path extension through the shuffle on its own')
+        self.add_passthru_arg('--shuffle-stats', action='store_true', default=False,
+                              help='count records and bytes leaving the mappers and combiners')
+        self.add_passthru_arg('--rounds-per-job', type=int, default=1,
+                              help='number of chained max-flow rounds in one job')
+        self.add_passthru_arg('--path-budget', choices=PATH_BUDGETS, default='fixed',
+                              help='how many excess paths a vertex keeps: fixed, by its number of edges '
+                                   'or by its number of unsaturated edges')
+        self.add_passthru_arg('--max-paths', type=int, default=MAX_PATHS,
+                              help='excess paths kept by every vertex with the fixed budget')
+        self.add_passthru_arg('--max-path-budget', type=int, default=MAX_PATH_BUDGET,
+                              help='upper bound of the degree and residual budgets')
+
+    def input_protocol(self):
+        return PROTOCOLS[self.options.protocol]()
+
+    def internal_protocol(self):
+        return PROTOCOLS[self.options.protocol]()
+
+    def output_protocol(self):
+        return PROTOCOLS[self.options.protocol]()
+
+    # number of excess paths a vertex keeps, from the edges the paths leave it by
+    def path_budget(self, edges):
+        if self.options.path_budget == 'fixed':
+            return self.options.max_paths
+
+        if self.options.path_budget == 'degree':
+            budget = len(edges)
+        else:
+            budget = sum(1 for edge in edges if edge[2] < edge[3])
+        return min(max(budget, 1), self.options.max_path_budget)
+
+    # the combiner doesn't see the vertex's edges, it only cuts at the largest budget
+    def combiner_path_budget(self):
+        if self.options.path_budget == 'fixed':
+            return self.options.max_paths
+        return self.options.max_path_budget
+
+    # count the records and encoded bytes a task stage hands to the shuffle
+    def count_shuffle(self, stage, key, value):
+        self.increment_counter("shuffle", stage + " records", 1)
+        self.increment_counter("shuffle", stage + " bytes", len(self.internal_protocol().write(key, value)) + 1)
+
+    # load the total flow of the edges augmented in the previous job into a lookup table,
+    # the side file is shipped once to every task instead of inside every vertex record
+    def mapper_init(self):
+        self.augmented_edges = dict()
+
+        if self.options.augmented_edges:
+            protocol = self.input_protocol()
+            with open(self.options.augmented_edges, 'rb') as augmented_file:
+                for line in augmented_file:
+                    key, value = protocol.read(line.rstrip(b"\r\n"))
+                    self.augmented_edges.update(value)
+
+    # later rounds of a chained job have no side file to load. The flow a round
+    # commits reaches the sink and the vertices of its edges as records of their own,
+    # their reducer in the next round applies it, the driver syncs every vertex after the job.
+    def chain_mapper_init(self):
+        self.augmented_edges = dict()
+
+    # excess paths are only chains inside a task, records and messages carry them packed
     def mapper(self, u, node_info):
-        saturated_edges = list()
+        if u != AUGMENTED_KEY:
+            node_info = unpack_value(node_info)
+
+        for key, value in self.map_vertex(u, node_info):
+            value = pack_value(value)
+            if self.options.shuffle_stats:
+                self.count_shuffle("mapper", key, value)
+            yield key, value
+
+    def map_vertex(self, u, node_info):
+        # flow committed by the previous rounds of a chained job goes back to the sink
+        if u == AUGMENTED_KEY:
+            yield (SINK, [list(), list(), list(), list(), node_info])
+            return
+
+        # flow committed on the edges of u by the previous round goes to its reducer
+        if len(node_info) > 4:
+            yield (u, node_info)
+            return
 
         # intermediate result from previous job
         # contains edges that were augmented before
-        augmented_edges = node_info[-1]
-        del node_info[-1]
+        augmented_edges = self.augmented_edges
 
         # node_info[0]: S_u source excess paths
         # node_info[1]: T_u sink excess paths
         # node_info[2]: E_u list of edges connecting u to neighbors
-
-        # update source and sink excess paths and edges from u according to augmented edges
-        # and add saturated edges
-        for edge in node_info[2]:
-            update_edge(edge, augmented_edges, saturated_edges)
-        for path in node_info[0]:
-            for edge in path:
-                update_edge(edge, augmented_edges, saturated_edges)
-        for path in node_info[1]:
-            for edge in path:
-                update_edge(edge, augmented_edges, saturated_edges)
-
-        # remove source and sink excess paths that are saturated
-        for e_id in saturated_edges:
-            for path in node_info[0]:
-                if path.count(e_id) > 0:
-                    node_info[0].remove(path)
-
-            for path in node_info[1]:
-                if path.count(e_id) > 0:
-                    node_info[1].remove(path)
-
-        # try to connect source excess paths to sink excess paths
-        accumulator = Accumulator()
-
-        for source_path in node_info[0]:
-            for sink_path in node_info[1]:
-                if accumulator.accept(source_path + sink_path):
-                    yield ("t", [[source_path + sink_path], [], []])
+        # node_info[3]: I_u list of edges coming into u, edge[0] is the tail of the edge
+        # node_info was rebuilt from the packed record, updated lists replace its slots
+
+        # update source and sink excess paths and edges of u according to augmented edges
+        # and remove source and sink excess paths that are saturated
+        if len(augmented_edges) > 0:
+            node_info[2] = [update_edge(edge, augmented_edges) for edge in node_info[2]]
+            node_info[3] = [update_edge(edge, augmented_edges) for edge in node_info[3]]
+            node_info[0] = update_paths(node_info[0], augmented_edges)
+            node_info[1] = update_paths(node_info[1], augmented_edges)
+
+        # vertices visited by every source and sink excess path of u
+        source_visited = [path_vertices(source_path) for source_path in node_info[0]]
+        sink_visited = [path_vertices(sink_path) for sink_path in node_info[1]]
+
+        # try to connect source excess paths to sink excess paths, that share no vertex
+        # a sink excess path that grew back to s is an augmenting path on its own
+        candidates = [join_paths(source_path, sink_path)
+                      for source_path, source_vertices in zip(node_info[0], source_visited)
+                      for sink_path, sink_vertices in zip(node_info[1], sink_visited)
+                      if source_vertices.isdisjoint(sink_vertices)]
+        if u == SOURCE:
+            candidates.extend(node_info[1])
+
+        for augmenting_path in Accumulator().accept_all(candidates):
+            yield (SINK, [[augmenting_path], [], [], []])
 
         # regenerate neighbours of s to search new source excess paths
-        if u == "s":
+        if u == SOURCE:
             for edge in node_info[2]:
-                yield (edge[0], [[[[edge[0], edge[1], edge[2], edge[3]]]], list(), list()])
+                yield (edge[0], [[extend_path(None, edge)], list(), list(), list()])
+
+        # regenerate neighbours of t to search new sink excess paths
+        if u == SINK:
+            for edge in node_info[3]:
+                yield (edge[0], [list(), [extend_path(None, [SINK, edge[1], edge[2], edge[3]])], list(), list()])
+
+        # extend sink excess paths backward along the edges coming into u
+        if len(node_info[1]) > 0 and u != SOURCE:
+            for edge in node_info[3]:
+                e_w, e_f, e_c = edge[0], edge[2], edge[3]
+                if edge[2] < edge[3]:
+                    forward_edge = [u, edge[1], edge[2], edge[3]]
+                    new_paths = [extend_path(sink_path, forward_edge)
+                                 for sink_path, sink_vertices in zip(node_info[1], sink_visited)
+                                 if e_w != u and e_w not in sink_vertices]
+                    if len(new_paths) > 0:
+                        yield (e_w, [list(), new_paths, list(), list()])
 
         # extend source excess paths
         if len(node_info[0]) > 0:
             for edge in node_info[2]:
                 e_v, e_f, e_c = edge[0], edge[2], edge[3]
                 if edge[2] < edge[3]:
-                    for source_path in node_info[0]:
-                        if not edge_forms_cycle(edge, source_path):
-                            yield (e_v, [[source_path + [edge]], list(), list()])
+                    new_paths = [extend_path(source_path, edge)
+                                 for source_path, source_vertices in zip(node_info[0], source_visited)
+                                 if e_v not in source_vertices]
+                    if len(new_paths) > 0:
+                        yield (e_v, [new_paths, list(), list(), list()])
+
+        yield (u, [node_info[0], node_info[1], node_info[2], node_info[3]])
+
+    def combiner(self, u, values):
+        A_p = Accumulator() # store non conflicting augmenting paths
+        A_s = Accumulator() # store non conflicting source excess paths
+        A_t = Accumulator() # store non conflicting sink excess paths
+
+        S_u = list() # source excess paths
+        T_u = list() # sink excess paths
+        budget = self.combiner_path_budget()
 
-        yield (u, [node_info[0], node_info[1], node_info[2]])
+        for val in values:
+            if len(val) > 4 or len(val[2]) > 0 or len(val[3]) > 0:
+                # the vertex's own record and committed flow go to the reducer untouched
+                if self.options.shuffle_stats:
+                    self.count_shuffle("combiner", u, val)
+                yield u, val
+                continue
+
+            S_u.extend(unpack_paths(val[0]))
+            T_u.extend(unpack_paths(val[1]))
+
+        # pre merge source and sink excess paths with the same filtering as the reducer
+        if u == SINK:
+            S_u = A_p.accept_all(S_u)
+        else:
+            S_u = A_s.accept_all(S_u, budget, widest_first=False)
+        T_u = A_t.accept_all(T_u, budget, widest_first=False)
 
-    def reducer(self, u, values):
+        # send at most one bounded bundle of excess paths per vertex
+        # always send it, a vertex without edges has no other record to keep it alive
+        value = pack_value([S_u, T_u, list(), list()])
+        if self.options.shuffle_stats:
+            self.count_shuffle("combiner", u, value)
+        yield u, value
+
+    def reducer(self, u, values, chained=False):
         # initialize new Accumulators
         A_p = Accumulator() # store non conflicting augmenting paths
         A_s = Accumulator() # store non conflicting source excess paths
@@ -136,49 +462,118 @@ class MRFlow(mrjob.job.MRJob):
         S_u = list() # source excess paths
         T_u = list() # sink excess paths
         E_u = list() # list of edges connecting u to neighbours
+        I_u = list() # list of edges coming into u
+        kept_S_u = list() # source excess paths u kept in the previous round
+        kept_T_u = list() # sink excess paths u kept in the previous round
+        committed = dict() # total flow of the edges augmented by earlier rounds of the job
 
         # val[0] = source excess paths to vertex
         # val[1] = sink excess paths to vertex
         # val[2] = list of edges connecting vertex to neighbour
+        # val[3] = list of edges coming into vertex
+        # val[4] = flow committed by earlier rounds of a chained job, on the edges of the vertex,
+        #          at the sink on every edge augmented in the job
+
         for val in values:
-            if len(val[2]) > 0:
-                # store neighbours of master
-                E_u = val[2]
-
-            # merge and filter source excess paths to vertex
-            for se in val[0]:
-                if u == "t":
-                    A_p.accept(se)
-                if u != "t" and len(S_u) < MAX_PATHS and A_s.accept(se):
-                    S_u.append(se)
-
-            # accumulate sink excess paths
-            for te in val[1]:
-                if len(T_u) < MAX_PATHS and A_t.accept(te):
-                    T_u.append(te)
-
-        # initalize counter
-        counter_init = [("move", "source", 0), ("move", "source", 0), ("move", "source", len(S_u))]
-        for item in counter_init:
-            self.increment_counter(item[0], item[1], item[2])
+            if len(val[2]) > 0 or len(val[3]) > 0:
+                # store neighbours of master and the excess paths of its own record
+                E_u, I_u = val[2], val[3]
+                kept_S_u, kept_T_u = unpack_paths(val[0]), unpack_paths(val[1])
+                continue
+
+            if len(val) > 4:
+                committed.update(val[4])
+
+            # gather source and sink excess paths to vertex
+            S_u.extend(unpack_paths(val[0]))
+            T_u.extend(unpack_paths(val[1]))
+
+        # update the edges and excess paths with the flow committed since the mappers read them,
+        # the sink checks new augmenting paths against it
+        if len(committed) > 0:
+            E_u = [update_edge(edge, committed) for edge in E_u]
+            I_u = [update_edge(edge, committed) for edge in I_u]
+            kept_S_u = update_paths(kept_S_u, committed)
+            kept_T_u = update_paths(kept_T_u, committed)
+            S_u = update_paths(S_u, committed)
+            T_u = update_paths(T_u, committed)
+
+        # the paths u already kept are tried before new ones and every path only once,
+        # so without new flow the paths of a vertex only grow until its budget is full
+        kept = set(path_key(path) for path in kept_S_u + kept_T_u)
+        S_u = unique_paths(kept_S_u + S_u)
+        T_u = unique_paths(kept_T_u + T_u)
+
+        # source excess paths leave u by its edges, sink excess paths by the edges
+        # coming into it, except at s where they are augmenting paths
+        source_budget = self.path_budget(E_u)
+        sink_budget = self.path_budget(E_u if u == SOURCE else I_u)
+
+        # merge and filter the excess paths
+        # source excess paths reaching t are augmenting paths
+        if u == SINK:
+            augmenting_paths = A_p.accept_all(S_u)
+            self.increment_counter("progress", "augmenting paths", len(augmenting_paths))
+            S_u = list()
+        else:
+            S_u = A_s.accept_all(S_u, source_budget, widest_first=False)
+        T_u = A_t.accept_all(T_u, sink_budget, widest_first=False)
+
+        # count the excess paths u didn't have before and whether it kept a different set,
+        # a round without augmenting paths and changed vertices leaves every record as it was
+        new_paths = sum(1 for path in S_u + T_u if path_key(path) not in kept)
+        self.increment_counter("progress", "new excess paths", new_paths)
+        if new_paths > 0 or len(S_u) + len(T_u) != len(kept):
+            self.increment_counter("progress", "changed vertices", 1)
 
         # generate augmenting path
-        is_sink = u == "t"
+        is_sink = u == SINK
         if is_sink:
-            key = "A_p"
-            value = A_p.edges
+            # new total flow of the edges on the accepted paths
+            flows = dict()
+            changed = dict()
+            for path in augmenting_paths:
+                for tail, edge in path_tails(path):
+                    flows[edge[1]] = edge[2] + A_p.edges[edge[1]]
+                    for vertex in (tail, edge[0]):
+                        changed.setdefault(vertex, set()).add(edge[1])
+            committed.update(flows)
+
+            key = AUGMENTED_KEY
+            value = [[edge_id, flow] for edge_id, flow in committed.items()]
             yield key, value
 
+            # the next round of the job applies the new flow at both ends of every edge
+            if chained:
+                for vertex, edge_ids in changed.items():
+                    if vertex != SINK:
+                        yield vertex, pack_value([list(), list(), list(), list(),
+                                                  [[edge_id, flows[edge_id]] for edge_id in edge_ids]])
+
         key = u
         value = list()
         value.append(S_u)
         value.append(T_u)
         value.append(E_u)
+        value.append(I_u)
+
+        yield key, pack_value(value)
 
-        yield key, value
+    # reducer of a round followed by another one in the same job
+    def chain_reducer(self, u, values):
+        return self.reducer(u, values, chained=True)
 
     def steps(self):
-        return [mrjob.step.MRStep(mapper=self.mapper, reducer=self.reducer)]
+        combiner = self.combiner if self.options.combiner else None
+        num_rounds = self.options.rounds_per_job
+        rounds = list()
+
+        # chain more rounds, the driver only syncs augmented edges after the last one
+        for i in range(num_rounds):
+            rounds.append(mrjob.step.MRStep(mapper_init=self.mapper_init if i == 0 else self.chain_mapper_init,
+                                            mapper=self.mapper, combiner=combiner,
+                                            reducer=self.chain_reducer if i < num_rounds - 1 else self.reducer))
+        return rounds
 
     def __init__(self, *args, **kwargs):
         super(MRFlow, self).__init__(*args, **kwargs)
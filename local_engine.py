@@ -0,0 +1,127 @@
+import multiprocessing
+import ff_mapreduce
+
+### In-process Map-Reduce engine for local runs ###
+# Runs the MRFlow mapper, combiner and reducer directly on Python objects,
+# without mrjob's temp files, subprocesses and serialization.
+# Map tasks run on slices of the vertex records in a multiprocessing pool,
+# their output is hash partitioned by key and every partition is reduced by one task.
+
+class InProcessFlow(ff_mapreduce.MRFlow):
+    # the augmented edges of the previous sync come from the driver,
+    # not from a side file
+    def mapper_init(self):
+        self.augmented_edges = self.side_augmented_edges
+
+    def increment_counter(self, group, counter, amount=1):
+        group_counters = self.task_counters.setdefault(group, {})
+        group_counters[counter] = group_counters.get(counter, 0) + amount
+
+def make_job(job_args, augmented_edges=None):
+    job = InProcessFlow(args=job_args)
+    job.side_augmented_edges = augmented_edges if augmented_edges != None else {}
+    job.task_counters = {}
+    return job
+
+# add the counters of a task into the counters of its round
+def merge_counters(totals, counters):
+    for group, group_counters in counters.items():
+        group_totals = totals.setdefault(group, {})
+        for name, amount in group_counters.items():
+            group_totals[name] = group_totals.get(name, 0) + amount
+
+# run the mapper (and combiner) of a round on a slice of records,
+# return the output split into one list of (key, values) per partition
+def map_task(task):
+    job_args, round_index, augmented_edges, records, num_partitions = task
+    job = make_job(job_args, augmented_edges)
+    step = job.steps()[round_index]
+
+    if step['mapper_init'] != None:
+        step['mapper_init']()
+
+    grouped = dict()
+    for key, value in records:
+        for out_key, out_value in step['mapper'](key, value):
+            grouped.setdefault(out_key, []).append(out_value)
+
+    if step['combiner'] != None:
+        for key in grouped:
+            grouped[key] = [value for out_key, value in step['combiner'](key, iter(grouped[key]))]
+
+    partitions = [[] for i in range(num_partitions)]
+    for key, values in grouped.items():
+        partitions[hash(key) % num_partitions].append((key, values))
+
+    return partitions, job.task_counters
+
+# run the reducer of a round on one partition, gathered from every map task
+def reduce_task(task):
+    job_args, round_index, map_outputs = task
+    job = make_job(job_args)
+    step = job.steps()[round_index]
+
+    grouped = dict()
+    for map_output in map_outputs:
+        for key, values in map_output:
+            grouped.setdefault(key, []).extend(values)
+
+    # keys reach the reducer sorted, like the mrjob shuffle
+    output = list()
+    for key in sorted(grouped):
+        output.extend(step['reducer'](key, iter(grouped[key])))
+
+    return output, job.task_counters
+
+class InProcessRunner:
+    # keeps the same counters() shape as an mrjob runner, one dict per round
+    def __init__(self, job_args, workers=None):
+        self.job_args = list(job_args)
+        self.workers = workers if workers else multiprocessing.cpu_count()
+        self.pool = multiprocessing.Pool(self.workers) if self.workers > 1 else None
+        self.round_counters = list()
+
+    def map(self, function, tasks):
+        if self.pool == None:
+            return list(map(function, tasks))
+        return self.pool.map(function, tasks)
+
+    # run every round of the job on the vertex records and return the output records
+    def run(self, records, augmented_edges):
+        self.round_counters = list()
+        num_rounds = len(make_job(self.job_args).steps())
+        num_tasks = self.workers
+
+        for round_index in range(num_rounds):
+            counters = dict()
+
+            # map contiguous splits of the records, only the first round sees the augmented edges
+            # splits stay the same from round to round so the combiners merge the same excess paths
+            side_input = augmented_edges if round_index == 0 else None
+            split_size = -(-len(records) // num_tasks)
+            map_results = self.map(map_task, [(self.job_args, round_index, side_input,
+                                               records[i * split_size:(i + 1) * split_size], num_tasks)
+                                              for i in range(num_tasks)])
+            for partitions, task_counters in map_results:
+                merge_counters(counters, task_counters)
+
+            # shuffle in memory, partition p of every map task goes to reduce task p
+            reduce_results = self.map(reduce_task, [(self.job_args, round_index, [partitions[p] for partitions, c in map_results])
+                                                    for p in range(num_tasks)])
+            records = list()
+            for output, task_counters in reduce_results:
+                records.extend(output)
+                merge_counters(counters, task_counters)
+            records.sort(key=lambda record: record[0])
+
+            self.round_counters.append(counters)
+
+        return records
+
+    def counters(self):
+        return self.round_counters
+
+    def close(self):
+        if self.pool != None:
+            self.pool.close()
+            self.pool.join()
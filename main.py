@@ -1,206 +1,358 @@
 from python_graph.digraph import digraph
 from python_graph.searching import depth_first_search as dfs
+from python_graph import minmax
 from mrjob.util import to_lines as get_lines
+import argparse
 import sys
 import json
+import os
+import shutil
+import checkpoint
 import ff_mapreduce
+import local_engine
+import metrics
+
+# Vertices still changing their excess paths below which the hybrid mode finishes on one node
+HYBRID_FRONTIER = 50
+
+# Single node max-flow solvers the hybrid mode can finish with
+SOLVERS = {"edmonds-karp": minmax.maximum_flow,
+           "push-relabel": minmax.maximum_flow_push_relabel,
+           "dinic": minmax.maximum_flow_dinic}
+
+# Check from the counters of every round of a job whether it made progress:
+# it committed flow in one of its rounds, or vertices still changed their
+# excess paths in its last round. Otherwise the next job would see the same records
+def made_progress(job_counters):
+    augmenting_paths = sum(round_counters.get("progress", {}).get("augmenting paths", 0)
+                           for round_counters in job_counters)
+    changed_vertices = job_counters[-1].get("progress", {}).get("changed vertices", 0)
+    return augmenting_paths > 0 or changed_vertices > 0
+
+# Add the counters of every step of a finished job into totals
+def add_counters(job, totals):
+    for step_counters in job.counters():
+        for group, counters in step_counters.items():
+            group_totals = totals.setdefault(group, {})
+            for name, amount in counters.items():
+                group_totals[name] = group_totals.get(name, 0) + amount
+    return totals
+
+# Read the graph file and intern vertex names and edges to dense integer ids
+# The source "s" and sink "t" always get ff_mapreduce.SOURCE and ff_mapreduce.SINK
+def read_graph(in_graph_file):
+    vertex_ids = {}
+    vertex_names = []
+    edge_tails, edge_heads, edge_caps = [], [], []
+
+    def intern(name):
+        vertex = vertex_ids.get(name)
+        if vertex is None:
+            vertex = vertex_ids[name] = len(vertex_names)
+            vertex_names.append(name)
+        return vertex
+
+    intern("s")
+    intern("t")
 
-# Check if the Map-Reduce rounds are terminated
-def is_terminated(job, current, prev):
-    source_counter = job.counters()[0]["move"]["source"]
-    # If source counter changes, it is not converged
-    new_value = 5 if source_counter != prev else current - 1
-    current = new_value
-    prev = source_counter
-    return current, prev
-
-def json_to_string(json_obj):
-    return json.dumps(json_obj)
-
-# Copy a graphs vertices and edges into another empty graph
-def copy_graph(other): 
-    old_nodes = other.nodes()
-    new_graph = digraph()
-    new_graph.add_nodes(old_nodes)
-    old_edges = other.edges()
-    for edge in old_edges:
-        edge_weight = other.edge_weight(edge)
-        new_graph.add_edge(edge, edge_weight)
-    return new_graph
-
-# Read the file, create the graph and start map reduce jobs
-def run(in_graph_file, is_cloud):
-
-    # Get the file and read it
-    mr_file_name = "mr_max_flow.txt"
     graph_file = open(in_graph_file, "r")
-    
-    # Generate the original graph thas is read from the file
-    original_graph = digraph()
     for line in graph_file:
         kv_pair = line.split("\t")
-        vertex = kv_pair[0]
-        vertex = json.loads(vertex)
-        edges = kv_pair[1]
-        edges = json.loads(edges)
-
-        node_exists = original_graph.has_node(vertex)
-        if node_exists == False: original_graph.add_node(vertex)
+        vertex = intern(json.loads(kv_pair[0]))
+        edges = json.loads(kv_pair[1])
 
+        # Edge ids are the position of the edge in the arrays
         for edge in edges:
-            node_exists = original_graph.has_node(edge[0])
-            if node_exists == False: original_graph.add_node(edge[0])
-            original_graph.add_edge((vertex, edge[0]), wt=edge[1])
-
-
-    # Convert the graph into new data structure of key, value pairs
-    # nodeID: E_u, S_u, T_u
-    neighbors_of_s = {}
-    mr_graph = {}
-
-    for source_vertex in original_graph.nodes():
-        node_properties = list()
-        node_properties.append(list()) # List of edges of vertex
-        node_properties.append(list()) # Source excess paths of vertex
-        node_properties.append(list()) # Sink excess paths of vertex
-
-        for destionation_vertex in original_graph.neighbors(source_vertex):
-            # Create an edge between the node and its neighbors
-            edge = (source_vertex, destionation_vertex)
-            # Edge = (Destination vertex, edge id, flow, capacity)
-            new_edge = [edge[1], edge[0] + "," + edge[1], 0, original_graph.edge_weight(edge)]
-            node_properties[0].append(new_edge)
-
-            # Check if the vertices of new edge are source or sink nodes
-            is_source = edge[0] == "s"
-            is_sink = edge[1] == "t"
-            # If so, add an excess path to the list
-            if is_source: neighbors_of_s[edge[1]] = new_edge
-            if is_sink: node_properties[2].append([new_edge])
-
-        # Add a vertex to the map
-        mr_graph[source_vertex] = [node_properties[1], node_properties[2], node_properties[0]]
-
-    # Set the edges of vertex
-    for u, edge in neighbors_of_s.items():
-        mr_graph[u][0] = [[edge]]
-
-
-    # Open a file and write the newly generated structure
-    outfile = open(mr_file_name, "w")
-    for key in mr_graph:
-        mr_graph[key].append({})
-        new_line = json_to_string(key)
-        new_line += "\t"
-        new_line += json_to_string(mr_graph[key])
-        new_line += "\n"
-        outfile.write(new_line)
+            edge_tails.append(vertex)
+            edge_heads.append(intern(edge[0]))
+            edge_caps.append(edge[1])
+    graph_file.close()
+
+    return vertex_names, edge_tails, edge_heads, edge_caps
+
+# Save the reverse mapping from vertex ids to names, one JSON name per line
+def write_vertex_names(file_name, vertex_names):
+    names_file = open(file_name, "w")
+    for name in vertex_names:
+        names_file.write(json.dumps(name) + "\n")
+    names_file.close()
+
+# Run one job with mrjob on the vertex records in mr_file_name, then write the
+# records and the augmented edges the next job reads
+def run_mrjob_job(is_cloud, job_args, wire, mr_file_name, augmented_file_name, augmented_edges, run_metrics=None):
+    # Read the input from file that contains in the new data structure form
+    infile = open(mr_file_name, "rb")
+
+    # Set the environment
+    if is_cloud:
+        mr_job = ff_mapreduce.MRFlow(args=['-r', 'dataproc'] + job_args)
+    else:
+        mr_job = ff_mapreduce.MRFlow(args=job_args)
+
+    # Give the job to the MRJob library and make it run the round
+    mr_job.stdin = infile
+    runner = mr_job.make_runner()
+    runner.run()
+    infile.close()
+
+    # Both protocols encode a key to the same bytes every time, so the augmented
+    # edges line is found by its key without decoding the vertex records
+    A_p_line = wire.write(ff_mapreduce.AUGMENTED_KEY, [])
+    A_p_prefix = A_p_line.split(b"\t", 1)[0] + b"\t"
+
+    # Stream the output of the Map-Reduce round into the input of the next one
+    # The vertex records are copied as they are, only the augmented edges of this
+    # round go to the side file that every mapper of the next round loads
+    outfile = open(mr_file_name + ".next", "wb")
+    for line in get_lines(runner.cat_output()):
+        line = line.rstrip(b"\r\n")
+        if len(line) == 0:
+            continue
+
+        # The augmented edges hold the total flow of every edge the job augmented
+        if line.startswith(A_p_prefix):
+            A_p_line = line
+            for edge_id, flow in wire.read(line)[1]:
+                augmented_edges[edge_id] = flow
+        else:
+            outfile.write(line + b"\n")
+            if run_metrics != None:
+                run_metrics.add_vertex(*wire.read(line))
     outfile.close()
+    os.replace(mr_file_name + ".next", mr_file_name)
+
+    augmented_file = open(augmented_file_name, "wb")
+    augmented_file.write(A_p_line + b"\n")
+    augmented_file.close()
+
+    return runner
+
+# Run one job with the in-process engine, the vertex records and augmented edges
+# stay Python objects between jobs
+def run_inprocess_job(engine, records, A_p, augmented_edges, run_metrics=None):
+    next_records = []
+    next_A_p = {}
+
+    for key, value in engine.run(records, A_p):
+        # The augmented edges hold the total flow of every edge the job augmented
+        if key == ff_mapreduce.AUGMENTED_KEY:
+            next_A_p = dict(value)
+            for edge_id, flow in value:
+                augmented_edges[edge_id] = flow
+        else:
+            next_records.append((key, value))
+            if run_metrics != None:
+                run_metrics.add_vertex(key, value)
+
+    return next_records, next_A_p
+
+# Read the vertex records of a file written with wire, the in-process engine
+# resumes from them
+def read_records(file_name, wire):
+    records = []
+    records_file = open(file_name, "rb")
+    for line in records_file:
+        records.append(wire.read(line.rstrip(b"\r\n")))
+    records_file.close()
+    return records
 
-    # Create a dictionary to keep the augmented edges
-    augmented_edges = {}
+# Read the file, create the graph and start map reduce jobs
+def run(in_graph_file, environment, job_args=(), counters=None, protocol="compact", workers=None,
+        metrics_file=None, checkpoint_dir=None, keep_checkpoints=2, resume=False,
+        hybrid_gain=None, hybrid_frontier=HYBRID_FRONTIER, solver="dinic"):
 
-    # Create counters to keep track of convergence
-    converge_count = 1
-    previous_count = -1
+    # Get the file and read it
+    mr_file_name = "mr_max_flow.txt"
+    augmented_file_name = "mr_max_flow_augmented.txt"
+    vertex_names, edge_tails, edge_heads, edge_caps = read_graph(in_graph_file)
+    write_vertex_names("mr_max_flow_vertices.txt", vertex_names)
 
-    # Continue to perform Map-Reduce rounds until the max-flow value converges
-    while converge_count != 0:
-        # Read the input from file that contains in the new data structure form
-        infile = open(mr_file_name, "rb")
+    # Generate the original graph thas is read from the file
+    original_graph = digraph.from_edges(zip(edge_tails, edge_heads, edge_caps), range(len(vertex_names)))
 
-        # Set the environment
-        if is_cloud:
-            mr_job = ff_mapreduce.MRFlow(args=['-r', 'dataproc'])
+    # Convert the graph into new data structure of key, value pairs
+    # nodeID: S_u, T_u, E_u, I_u
+    mr_graph = [[list(), list(), list(), list()] for vertex in vertex_names]
+
+    for edge_id in range(len(edge_caps)):
+        source_vertex, destination_vertex = edge_tails[edge_id], edge_heads[edge_id]
+        # Edge = (Destination vertex, edge id, flow, capacity)
+        new_edge = [destination_vertex, edge_id, 0, edge_caps[edge_id]]
+        mr_graph[source_vertex][2].append(new_edge)
+
+        # Incoming edge = (Source vertex, edge id, flow, capacity), sink excess paths grow along it
+        mr_graph[destination_vertex][3].append([source_vertex, edge_id, 0, edge_caps[edge_id]])
+
+        # Check if the vertices of new edge are source or sink nodes
+        # If so, add an excess path to the list
+        if source_vertex == ff_mapreduce.SOURCE: mr_graph[destination_vertex][0] = [ff_mapreduce.extend_path(None, new_edge)]
+        if destination_vertex == ff_mapreduce.SINK: mr_graph[source_vertex][1].append(ff_mapreduce.extend_path(None, new_edge))
+
+    # The jobs read and write the excess paths of a record packed
+    mr_graph = [ff_mapreduce.pack_value(value) for value in mr_graph]
+
+    # Keep the flow augmented on each edge, indexed by edge id
+    augmented_edges = [0] * len(edge_caps)
+
+    # Write one metrics line per round, the flow of a job is what it adds on the edges into t
+    run_metrics = metrics.RunMetrics(metrics_file, vertex_names) if metrics_file else None
+    sink_edges = [edge_id for edge_id in range(len(edge_caps)) if edge_heads[edge_id] == ff_mapreduce.SINK]
+
+    # Checkpoints hold the records and the augmented edges the next job reads,
+    # in the same protocol for both environments
+    wire = ff_mapreduce.PROTOCOLS[protocol]()
+    checkpoints = checkpoint.Checkpoints(checkpoint_dir, keep_checkpoints) if checkpoint_dir else None
+    resume_path = checkpoints.latest() if checkpoints != None and resume else None
+    rounds_done = 0
+    progress = True
+    if resume_path != None:
+        state = checkpoint.read_state(resume_path)
+        if state["protocol"] != protocol or len(state["augmented_edges"]) != len(edge_caps):
+            raise ValueError("checkpoint %s is not from a %s run on this graph" % (resume_path, protocol))
+        augmented_edges = state["augmented_edges"]
+        rounds_done = state["rounds"]
+        progress = state["progress"]
+        vertices_file_name = os.path.join(resume_path, checkpoint.VERTICES_FILE)
+        A_p_file_name = os.path.join(resume_path, checkpoint.AUGMENTED_FILE)
+
+    if environment == "inprocess":
+        # Keep the vertex records in memory and run the rounds in a pool of processes
+        engine = local_engine.InProcessRunner(job_args, workers)
+        if resume_path != None:
+            records = read_records(vertices_file_name, wire)
+            A_p = dict(read_records(A_p_file_name, wire)[0][1])
+        else:
+            records = [(key, mr_graph[key]) for key in range(len(mr_graph))]
+            A_p = {}
+
+        def write_checkpoint(directory):
+            outfile = open(os.path.join(directory, checkpoint.VERTICES_FILE), "wb")
+            for key, value in records:
+                outfile.write(wire.write(key, value) + b"\n")
+            outfile.close()
+            augmented_file = open(os.path.join(directory, checkpoint.AUGMENTED_FILE), "wb")
+            augmented_file.write(wire.write(ff_mapreduce.AUGMENTED_KEY, list(A_p.items())) + b"\n")
+            augmented_file.close()
+    else:
+        # Open a file and write the newly generated structure
+        # Vertex records are encoded with the same protocol the job reads and writes
+        engine = None
+        job_args = ["--protocol", protocol, "--augmented-edges", augmented_file_name] + list(job_args)
+        if resume_path != None:
+            shutil.copyfile(vertices_file_name, mr_file_name)
+            shutil.copyfile(A_p_file_name, augmented_file_name)
+        else:
+            outfile = open(mr_file_name, "wb")
+            for key in range(len(mr_graph)):
+                outfile.write(wire.write(key, mr_graph[key]) + b"\n")
+            outfile.close()
+
+            # Nothing is augmented before the first round
+            augmented_file = open(augmented_file_name, "wb")
+            augmented_file.write(wire.write(ff_mapreduce.AUGMENTED_KEY, []) + b"\n")
+            augmented_file.close()
+
+        def write_checkpoint(directory):
+            shutil.copyfile(mr_file_name, os.path.join(directory, checkpoint.VERTICES_FILE))
+            shutil.copyfile(augmented_file_name, os.path.join(directory, checkpoint.AUGMENTED_FILE))
+
+    # Continue to perform Map-Reduce jobs until one of them makes no progress,
+    # or until the rest of the flow is cheaper to find on a single node
+    finish_in_memory = False
+    while progress:
+        if run_metrics != None:
+            run_metrics.start_job()
+        flow_before = sum(augmented_edges[edge_id] for edge_id in sink_edges)
+
+        input_bytes = output_bytes = None
+        if engine != None:
+            records, A_p = run_inprocess_job(engine, records, A_p, augmented_edges, run_metrics)
+            runner = engine
         else:
-            mr_job = ff_mapreduce.MRFlow()
-
-        # Give the job to the MRJob library and make it run the round
-        mr_job.stdin = infile
-        runner = mr_job.make_runner()
-        runner.run()
-        out_buffer = []
-
-        for line in get_lines(runner.cat_output()):
-            line = line.decode()
-            try:
-                kv_pair = line.split("\t")
-                key = kv_pair[0]
-                key = json.loads(key)
-                value = kv_pair[1]
-                value = json.loads(value)
-            except:
-                continue
-
-            if key == "A_p":
-                A_p = value
-                for edge in A_p:
-                    is_edge_augmented = edge in augmented_edges
-                    augmented_edges[edge] = augmented_edges[edge] + A_p[edge] if is_edge_augmented else A_p[edge]
+            input_bytes = os.path.getsize(mr_file_name)
+            runner = run_mrjob_job(environment == "cloud", job_args, wire, mr_file_name,
+                                   augmented_file_name, augmented_edges, run_metrics)
+            output_bytes = os.path.getsize(mr_file_name)
+
+        progress = made_progress(runner.counters())
+        rounds_done += len(runner.counters())
+        if checkpoints != None:
+            checkpoints.save(rounds_done, {"protocol": protocol, "progress": progress,
+                                           "augmented_edges": augmented_edges}, write_checkpoint)
+        flow = sum(augmented_edges[edge_id] for edge_id in sink_edges) - flow_before
+        if run_metrics != None:
+            run_metrics.end_job(runner.counters(), flow, input_bytes, output_bytes)
+        if counters is not None:
+            add_counters(runner, counters)
+            driver_counters = counters.setdefault("driver", {})
+            driver_counters["rounds"] = driver_counters.get("rounds", 0) + len(runner.counters())
+
+        # Late jobs add little flow but still pay for the whole graph, once the job's gain
+        # and the vertices still changing their excess paths are small the driver finishes.
+        # The gain is only measured against flow found by earlier jobs, before any flow
+        # reaches t the excess paths are still growing towards it
+        if progress and hybrid_gain != None and flow_before > 0:
+            frontier = runner.counters()[-1].get("progress", {}).get("changed vertices", 0)
+            if flow <= hybrid_gain * (flow_before + flow) and frontier <= hybrid_frontier:
+                finish_in_memory = True
+                progress = False
+                if counters is not None:
+                    counters["driver"]["finished in memory"] = 1
+
+    if engine != None:
+        engine.close()
+
+    # Take a copy-on-write snapshot of the graph in order to augment its edges,
+    # only the edges that carry flow are copied
+    augmented_graph = original_graph.snapshot()
+
+    # Update the each edge by using the augmentation results
+    # Only edges without capacity or saturated by the flow can end up with zero weight
+    zero_candidates = set()
+    for edge_id in range(len(edge_caps)):
+        flow = augmented_edges[edge_id]
+        if edge_caps[edge_id] == 0:
+            zero_candidates.add((edge_tails[edge_id], edge_heads[edge_id]))
+
+        # Set the flow if it is augmented
+        if flow != 0:
+            vertex_pair = [edge_tails[edge_id], edge_heads[edge_id]]
+
+            # Set the forward edges new weight by substracting the flow
+            residue = augmented_graph.edge_weight((vertex_pair[0], vertex_pair[1])) - flow
+            augmented_graph.set_edge_weight((vertex_pair[0], vertex_pair[1]), residue)
+            if residue < 0:
+                sys.exit(-1)
+            if residue == 0:
+                zero_candidates.add((vertex_pair[0], vertex_pair[1]))
+
+            # Set the back edges new weight by adding the flow, create if it doesn't exist
+            if augmented_graph.has_edge((vertex_pair[1], vertex_pair[0])):
+                new_weight = augmented_graph.edge_weight((vertex_pair[1], vertex_pair[0])) + flow
+                augmented_graph.set_edge_weight((vertex_pair[1], vertex_pair[0]), new_weight)
             else:
-                out_buffer.append(line)
-
-        # Write the output of Map-Reduce round so that the next round can start by reading it
-        outfile = open(mr_file_name, "w")
-        for line in out_buffer:
-            kv_pair = line.split("\t")
-            key = kv_pair[0]
-            key = json.loads(key)
-            value = kv_pair[1]
-            value = json.loads(value)
-
-            value.append(A_p)
-            new_line = json_to_string(key)
-            new_line += "\t"
-            new_line += json_to_string(value)
-            new_line += "\n"
-            outfile.write(new_line)
-
-        # Check the convergence values after the round
-        converge_count, previous_count = is_terminated(runner, converge_count, previous_count)
-
-        # Close input and output files
-        infile.close()
-        outfile.close()
-
-    # Copy the graph into another in order to augment its edges
-    augmented_graph = copy_graph(original_graph)
-    nodes = augmented_graph.nodes()
-
-    # Update the each node by using the augmentation results
-    for node in nodes:
-        for neighbor in augmented_graph.neighbors(node):
-            # Chosen a node, neigbor pair
-            vertex_pair = [node, neighbor]
-            
-            # Get the edge and check if it is augmented
-            edge = vertex_pair[0] + "," + vertex_pair[1]
-            is_edge_augmented = edge in augmented_edges
-        
-            # Set the flow if it is augmented
-            if is_edge_augmented:
-                flow = augmented_edges[edge]
-
-                # Set the forward edges new weight by substracting the flow
-                residue = augmented_graph.edge_weight((vertex_pair[0], vertex_pair[1])) - flow
-                augmented_graph.set_edge_weight((vertex_pair[0], vertex_pair[1]), residue)
-                if residue < 0:
-                    sys.exit(-1)
-
-                # Set the back edges new weight by adding the flow, create if it doesn't exist
-                if augmented_graph.has_edge((vertex_pair[1], vertex_pair[0])):
-                    new_weight = augmented_graph.edge_weight((vertex_pair[1], vertex_pair[0])) + flow
-                    augmented_graph.set_edge_weight((vertex_pair[1], vertex_pair[0]), new_weight)
-                else:
-                    augmented_graph.add_edge((vertex_pair[1], vertex_pair[0]), wt=flow)
+                augmented_graph.add_edge((vertex_pair[1], vertex_pair[0]), wt=flow)
 
     # Find the zero edges and remove them from the augmented graph
-    zero_edges = list(filter(lambda edge: augmented_graph.edge_weight(edge) == 0, augmented_graph.edges()))
-    for edge in augmented_graph.edges():
-        if edge in zero_edges: augmented_graph.del_edge(edge)
-
-    # Perform a depth first search starting from source node and get its preordering
-    cut_nodes = dfs(augmented_graph, "s")[1]
+    zero_edges = list(filter(lambda edge: augmented_graph.edge_weight(edge) == 0, zero_candidates))
+    for edge in zero_edges: augmented_graph.del_edge(edge)
+
+    if not finish_in_memory:
+        # Perform a depth first search starting from source node and get its preordering
+        cut_nodes = set(dfs(augmented_graph, ff_mapreduce.SOURCE)[1])
+
+        # A round without progress can also be a fixed point of a flow that is not maximal,
+        # the excess paths stalled while t is still reachable in the residual graph
+        if ff_mapreduce.SINK in cut_nodes:
+            finish_in_memory = True
+            if counters is not None:
+                counters.setdefault("driver", {})["stalled, finished in memory"] = 1
+
+    if finish_in_memory:
+        # Find the rest of the flow in the residual graph, the source side of its
+        # minimum cut is the source side of the cut of the original graph
+        cut = SOLVERS[solver](augmented_graph, ff_mapreduce.SOURCE, ff_mapreduce.SINK)[1]
+        cut_nodes = set(node for node in cut if cut[node] == 0)
     edges = original_graph.edges()
 
     # Find the edges that are connections between source part and sink part of the cut
@@ -210,27 +362,70 @@ def run(in_graph_file, is_cloud):
     edge_weights = list(map(lambda edge: original_graph.edge_weight(edge), edges))
     max_flow = sum(edge_weights)
 
+    if run_metrics != None:
+        run_metrics.close(max_flow)
+
     return max_flow
 
-# Get the graph file
-in_graph_file = sys.argv[1]
-
-# Check if the running environment is set
-if len(sys.argv) != 3:
-    print("Please choose input file and environment to be run")
-    print("Example usage: python3 main.py graph_file.txt local")
-    print("Example usage: python3 main.py graph_file.txt cloud")
-    sys.exit()
-
-# Get and set the environment
-if sys.argv[2] == "cloud":
-    is_cloud = True
-elif sys.argv[2] == "local":
-    is_cloud = False
-else:
-    print("Environment must be 'local' or 'cloud'")
-    sys.exit()
-
-# Run the job and get the max flow
-max_flow = run(in_graph_file, is_cloud)
-print("max_flow:", max_flow)
\ No newline at end of file
+def main(argv):
+    parser = argparse.ArgumentParser(description="Max-flow of a graph with Map-Reduce rounds")
+    parser.add_argument("graph_file", help="graph file with one vertex and its edges per line")
+    parser.add_argument("environment", choices=["local", "cloud", "inprocess"],
+                        help="where to run the Map-Reduce rounds, inprocess skips mrjob and uses a process pool")
+    parser.add_argument("--no-combiner", action="store_true",
+                        help="do not pre-merge excess paths on the mapper side")
+    parser.add_argument("--shuffle-stats", action="store_true",
+                        help="report the records and bytes sent through the shuffle")
+    parser.add_argument("--protocol", choices=sorted(ff_mapreduce.PROTOCOLS), default="compact",
+                        help="encoding of the vertex records between rounds, json is easier to debug")
+    parser.add_argument("--rounds-per-job", type=int, default=1, metavar="K",
+                        help="chain K Map-Reduce rounds in every job and sync the driver after them")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes of the inprocess environment, all cores by default")
+    parser.add_argument("--path-budget", choices=ff_mapreduce.PATH_BUDGETS, default="fixed",
+                        help="excess paths kept per vertex: fixed, by degree or by unsaturated edges")
+    parser.add_argument("--max-paths", type=int, default=ff_mapreduce.MAX_PATHS,
+                        help="excess paths kept per vertex with the fixed budget")
+    parser.add_argument("--max-path-budget", type=int, default=ff_mapreduce.MAX_PATH_BUDGET,
+                        help="upper bound of the degree and residual budgets")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write one JSON line per round and a summary line to FILE")
+    parser.add_argument("--checkpoint-dir", metavar="DIR",
+                        help="save the vertex records and augmented edges to DIR after every job")
+    parser.add_argument("--keep-checkpoints", type=int, default=2, metavar="N",
+                        help="number of newest checkpoints kept in the checkpoint directory")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue from the latest complete checkpoint in the checkpoint directory")
+    parser.add_argument("--hybrid-gain", type=float, default=None, metavar="FRACTION",
+                        help="finish on a single node once a job adds less than FRACTION of the flow found so far")
+    parser.add_argument("--hybrid-frontier", type=int, default=HYBRID_FRONTIER, metavar="N",
+                        help="and at most N vertices changed their excess paths in its last round")
+    parser.add_argument("--solver", choices=sorted(SOLVERS), default="dinic",
+                        help="single node max-flow algorithm the hybrid mode finishes with")
+    args = parser.parse_args(argv)
+    if args.resume and not args.checkpoint_dir:
+        parser.error("--resume needs --checkpoint-dir")
+    if args.keep_checkpoints < 1:
+        parser.error("--keep-checkpoints must be at least 1")
+
+    job_args = []
+    if args.no_combiner: job_args.append("--no-combiner")
+    # Metrics report the records and bytes of every round from the shuffle counters
+    if args.shuffle_stats or args.metrics: job_args.append("--shuffle-stats")
+    job_args += ["--rounds-per-job", str(args.rounds_per_job)]
+    job_args += ["--path-budget", args.path_budget, "--max-paths", str(args.max_paths),
+                 "--max-path-budget", str(args.max_path_budget)]
+
+    # Run the job and get the max flow
+    counters = {}
+    max_flow = run(args.graph_file, args.environment, job_args, counters, args.protocol, args.workers, args.metrics,
+                   args.checkpoint_dir, args.keep_checkpoints, args.resume, args.hybrid_gain, args.hybrid_frontier,
+                   args.solver)
+    print("max_flow:", max_flow)
+
+    if args.shuffle_stats:
+        for name, amount in sorted(counters.get("shuffle", {}).items()):
+            print("shuffle %s: %d" % (name, amount))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,90 @@
+import json
+import time
+
+### Metrics of a max-flow run ###
+# Writes one JSON line per Map-Reduce round and a summary line at the end.
+# Round lines hold the counters of the round. The last round of every job also
+# holds what the driver sees once the job is done: its wall time, the flow it
+# gained, the bytes of the vertex records it read and wrote, and how the excess
+# paths are spread over the vertices.
+# A vertex's output is measured in path extensions, len(S_u) * len(E_u) +
+# len(T_u) * len(I_u), the paths its mapper sends to its neighbours next round.
+
+class RunMetrics:
+    # vertices listed in every job line and in the summary
+    HOT_VERTICES = 5
+    # jobs listed in the summary
+    SLOWEST_JOBS = 5
+
+    def __init__(self, file_name, vertex_names):
+        self.metrics_file = open(file_name, "w")
+        self.vertex_names = vertex_names
+        self.start = time.time()
+        self.rounds = 0
+        self.jobs = list()
+        self.vertex_extensions = dict()
+
+    def write(self, record):
+        self.metrics_file.write(json.dumps(record) + "\n")
+
+    def start_job(self):
+        self.job_start = time.time()
+        self.job_vertices = 0
+        self.job_paths = 0
+        self.job_max_paths = 0
+        self.job_extensions = dict()
+
+    # called with every vertex record a job outputs, its excess paths are packed
+    # and the second list of a packed slot holds one entry per path
+    def add_vertex(self, vertex, value):
+        source_paths, sink_paths = len(value[0][1]), len(value[1][1])
+        paths = source_paths + sink_paths
+        extensions = source_paths * len(value[2]) + sink_paths * len(value[3])
+
+        self.job_vertices += 1
+        self.job_paths += paths
+        self.job_max_paths = max(self.job_max_paths, paths)
+        if extensions > 0:
+            self.job_extensions[vertex] = extensions
+            self.vertex_extensions[vertex] = self.vertex_extensions.get(vertex, 0) + extensions
+
+    def hot_vertices(self, extensions):
+        hot = sorted(extensions.items(), key=lambda item: item[1], reverse=True)[:self.HOT_VERTICES]
+        return [[self.vertex_names[vertex], amount] for vertex, amount in hot]
+
+    # round_counters has one dict per round of the job, the byte sizes are only
+    # known when the records went through files
+    def end_job(self, round_counters, flow, input_bytes=None, output_bytes=None):
+        job = {"job": len(self.jobs) + 1,
+               "seconds": time.time() - self.job_start,
+               "flow": flow,
+               "vertices": self.job_vertices,
+               "excess_paths": self.job_paths,
+               "max_excess_paths": self.job_max_paths,
+               "mean_excess_paths": float(self.job_paths) / max(self.job_vertices, 1),
+               "hot_vertices": self.hot_vertices(self.job_extensions)}
+        if input_bytes != None:
+            job["input_bytes"] = input_bytes
+            job["output_bytes"] = output_bytes
+        self.jobs.append(job)
+
+        for i in range(len(round_counters)):
+            self.rounds += 1
+            record = {"type": "round", "round": self.rounds, "job": job["job"], "counters": round_counters[i]}
+            if i == len(round_counters) - 1:
+                record.update(job)
+            self.write(record)
+
+    def close(self, max_flow):
+        slowest = sorted(self.jobs, key=lambda job: job["seconds"], reverse=True)[:self.SLOWEST_JOBS]
+        summary = {"type": "summary",
+                   "max_flow": max_flow,
+                   "rounds": self.rounds,
+                   "jobs": len(self.jobs),
+                   "seconds": time.time() - self.start,
+                   "flow_per_job": [job["flow"] for job in self.jobs],
+                   "slowest_jobs": [[job["job"], job["seconds"]] for job in slowest],
+                   "hot_vertices": self.hot_vertices(self.vertex_extensions)}
+        self.write(summary)
+        self.metrics_file.close()
+        return summary
@@ -113,7 +113,7 @@ class common( object ):
         @type  other: graph
         @param other: Graph
         """
-        self.add_nodes( n for n in other.nodes() if not n in self.nodes() )
+        self.add_nodes( n for n in other.nodes() if not self.has_node(n) )
         
         for each_node in other.nodes():
             for each_edge in other.neighbors(each_node):
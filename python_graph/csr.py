@@ -0,0 +1,182 @@
+# Copyright (c) 2008-2009 Pedro Matiello <pmatiello@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""
+Compressed sparse row residual graphs for the max-flow algorithms.
+
+@sort: csr_graph
+"""
+
+# Imports
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class csr_graph(object):
+    """
+    Residual graph of a digraph in compressed sparse row form.
+
+    Every edge of the digraph gives a forward arc with its capacity and a backward arc with none. The arcs
+    leaving node i are offsets[i] to offsets[i+1]-1, heads, capacity, flow and reverse are indexed by arc,
+    and reverse[a] is the arc going the other way. Flow is antisymmetric, flow[reverse[a]] == -flow[a].
+
+    @sort: __init__, arc_lists, flow_and_cut, levels, set_residual
+    """
+
+    def __init__(self, graph, caps = None):
+        """
+        Build the residual graph of a digraph with no flow.
+
+        @type graph: digraph
+        @param graph: Graph
+
+        @type caps: dictionary
+        @param caps: Dictionary specifying a maximum capacity for each edge. If not given, the weight of
+        the edge will be used as its capacity.
+        """
+        if numpy is None:
+            raise ImportError("csr_graph needs numpy")
+
+        if caps == None:
+            caps = {}
+            for edge in graph.edges():
+                caps[edge] = graph.edge_weight((edge[0],edge[1]))
+
+        self.nodes = graph.nodes()
+        self.index = {}
+        for i in range(len(self.nodes)):
+            self.index[self.nodes[i]] = i
+        self.edges = graph.edges()
+        n = len(self.nodes)
+        m = len(self.edges)
+
+        edge_tails = numpy.fromiter((self.index[u] for u, v in self.edges), numpy.int64, m)
+        edge_heads = numpy.fromiter((self.index[v] for u, v in self.edges), numpy.int64, m)
+        edge_caps = numpy.fromiter((caps[edge] for edge in self.edges), numpy.float64, m)
+
+        # Arc i < m is edge i and arc i + m its backward arc, before they are sorted by tail
+        arc_tails = numpy.concatenate((edge_tails, edge_heads))
+        order = numpy.argsort(arc_tails, kind="stable")
+        position = numpy.empty(2*m, numpy.int64)
+        position[order] = numpy.arange(2*m)
+        pair = numpy.concatenate((numpy.arange(m, 2*m), numpy.arange(m)))
+
+        self.offsets = numpy.zeros(n + 1, numpy.int64)
+        self.offsets[1:] = numpy.cumsum(numpy.bincount(arc_tails, minlength=n))
+        self.heads = numpy.concatenate((edge_heads, edge_tails))[order]
+        self.capacity = numpy.concatenate((edge_caps, numpy.zeros(m)))[order]
+        self.flow = numpy.zeros(2*m)
+        self.reverse = position[pair[order]]
+        self.edge_arcs = position[:m]
+
+    def _arcs_of(self, frontier):
+        """
+        Return the arcs leaving the given nodes, as one array.
+        """
+        starts = self.offsets[frontier]
+        counts = self.offsets[frontier + 1] - starts
+        # One run of consecutive arcs per node, arange shifted to the start of each run
+        shift = numpy.repeat(starts - numpy.cumsum(counts) + counts, counts)
+        return numpy.arange(counts.sum()) + shift
+
+    def levels(self, root, residual = None, backward = False):
+        """
+        Breadth first search over the arcs with residual capacity, one whole frontier at a time.
+
+        @type root: number
+        @param root: Index of the root node.
+
+        @type residual: sequence
+        @param residual: Residual capacity of each arc. If not given, it is computed from the flow.
+
+        @type backward: boolean
+        @param backward: Search the nodes that reach the root instead of those the root reaches.
+
+        @rtype: array
+        @return: Distance of each node from (or to) the root, -1 for the nodes not found.
+        """
+        if residual is None:
+            residual = self.capacity - self.flow
+        else:
+            residual = numpy.asarray(residual, numpy.float64)
+        if backward:
+            # Arc a leads from its head back to the tail when its reverse arc has room
+            residual = residual[self.reverse]
+
+        level = numpy.full(len(self.nodes), -1, numpy.int64)
+        level[root] = 0
+        frontier = numpy.array([root], numpy.int64)
+        depth = 0
+        while len(frontier) > 0:
+            arcs = self._arcs_of(frontier)
+            heads = self.heads[arcs[residual[arcs] > 0]]
+            frontier = numpy.unique(heads[level[heads] < 0])
+            depth += 1
+            level[frontier] = depth
+        return level
+
+    def arc_lists(self):
+        """
+        Return the arcs as Python lists for the augmenting loops of the solvers.
+
+        @rtype: tuple
+        @return: The heads, the residual capacities and the reverse arc of each arc, and the range of
+        arcs of each node.
+        """
+        offsets = self.offsets.tolist()
+        arcs = [range(offsets[i], offsets[i + 1]) for i in range(len(self.nodes))]
+        return (self.heads.tolist(), (self.capacity - self.flow).tolist(), self.reverse.tolist(), arcs)
+
+    def set_residual(self, residual):
+        """
+        Set the flow of each arc from its residual capacity.
+
+        @type residual: sequence
+        @param residual: Residual capacity of each arc.
+        """
+        residual = numpy.asarray(residual, numpy.float64)
+        with numpy.errstate(invalid="ignore"):
+            self.flow = self.capacity - residual
+        # An infinite arc keeps an infinite residual, its flow is the one of its backward arc
+        infinite = numpy.isinf(self.capacity)
+        self.flow[infinite] = residual[self.reverse[infinite]]
+
+    def flow_and_cut(self, source):
+        """
+        Return the flow of each edge and the component of each node in the cut the source side reaches.
+
+        @type source: node
+        @param source: Source of the flow
+
+        @rtype: tuple
+        @return: A tuple containing two dictionaries
+            1. contains the flow through each edge
+            2. contains to which component of the cut each node belongs
+        """
+        f = dict(zip(self.edges, self.flow[self.edge_arcs].tolist()))
+        reached = self.levels(self.index[source]) >= 0
+        cut = dict(zip(self.nodes, numpy.where(reached, 0, 1).tolist()))
+        return (f,cut)
@@ -30,6 +30,7 @@ Digraph class
 
 # Imports
 import sys
+import json
 sys.path.append('../python_graph')
 import python_graph.exceptions
 from python_graph.labeling import labeling
@@ -44,18 +45,23 @@ class digraph (basegraph, common, labeling):
     
     Digraphs are built of nodes and directed edges.
 
-    @sort: __eq__, __init__, __ne__, add_edge, add_node, del_edge, del_node, edges, has_edge, has_node,
-    incidents, neighbors, node_order, nodes 
+    @sort: __eq__, __init__, __ne__, add_edge, add_edges_bulk, add_node, copy, del_edge, del_node, edges,
+    from_adjacency_file, from_edges, has_edge, has_node, incidents, neighbors, node_order, nodes, snapshot
     """
     
     DIRECTED = True
 
-    def __init__(self):
+    def __init__(self, compact = False):
         """
         Initialize a digraph.
+        
+        @type  compact: boolean
+        @param compact: Keep edge weights in a typed array instead of one dict per edge. Weights are
+        then stored as floats, and labels and attributes only when they are set.
         """
         common.__init__(self)
-        labeling.__init__(self)
+        labeling.__init__(self, compact)
+        # Adjacency is kept in dicts used as ordered sets, insertion order with O(1) membership and removal
         self.node_neighbors = {}     # Pairing: Node -> Neighbors
         self.node_incidence = {}     # Pairing: Node -> Incident nodes
         
@@ -80,7 +86,7 @@ class digraph (basegraph, common, labeling):
         @rtype:  list
         @return: List of nodes directly accessible from given node.
         """
-        return self.node_neighbors[node]
+        return list(self.node_neighbors[node])
     
     
     def incidents(self, node):
@@ -93,7 +99,7 @@ class digraph (basegraph, common, labeling):
         @rtype:  list
         @return: List of nodes directly accessible from given node.    
         """
-        return self.node_incidence[node]
+        return list(self.node_incidence[node])
 
     def edges(self):
         """
@@ -137,8 +143,8 @@ class digraph (basegraph, common, labeling):
         if attrs is None:
             attrs = []
         if (node not in self.node_neighbors):
-            self.node_neighbors[node] = []
-            self.node_incidence[node] = []
+            self.node_neighbors[node] = {}
+            self.node_incidence[node] = {}
             self.node_attr[node] = attrs
         else:
             raise AdditionError("Node %s already in digraph" % node)
@@ -172,13 +178,153 @@ class digraph (basegraph, common, labeling):
         if v in self.node_neighbors[u] and u in self.node_incidence[v]:
             raise AdditionError("Edge (%s, %s) already in digraph" % (u, v))
         else:
-            self.node_neighbors[u].append(v)
-            self.node_incidence[v].append(u)
+            self.node_neighbors[u][v] = None
+            self.node_incidence[v][u] = None
             self.set_edge_weight((u, v), wt)
             self.add_edge_attributes( (u, v), attrs )
             self.set_edge_properties( (u, v), label=label, weight=wt )
 
 
+    def add_edges_bulk(self, edges):
+        """
+        Add many directed edges at once, without the checks and bookkeeping calls of add_edge.
+        
+        Missing nodes are added. An edge that is already in the digraph, or is given twice, keeps
+        the last weight instead of raising AdditionError. Edges get the default label and no attributes.
+
+        @type  edges: iterable
+        @param edges: Edges given as (u, v, weight) tuples.
+        """
+        node_neighbors = self.node_neighbors
+        node_incidence = self.node_incidence
+        if self.compact:
+            edge_slot = self.edge_slot
+            edge_weights = self.edge_weights
+        else:
+            edge_properties = self.edge_properties
+            weight_name = self.WEIGHT_ATTRIBUTE_NAME
+            label_name = self.LABEL_ATTRIBUTE_NAME
+            label = self.DEFAULT_LABEL
+        
+        for u, v, wt in edges:
+            # Nodes are only looked up again when they are missing
+            try:
+                node_neighbors[u][v] = None
+            except KeyError:
+                self._add_missing_node(u)
+                node_neighbors[u][v] = None
+            try:
+                node_incidence[v][u] = None
+            except KeyError:
+                self._add_missing_node(v)
+                node_incidence[v][u] = None
+            
+            edge = (u, v)
+            if self.compact:
+                slot = edge_slot.setdefault(edge, len(edge_weights))
+                if slot == len(edge_weights):
+                    edge_weights.append(wt)
+                else:
+                    edge_weights[slot] = wt
+            else:
+                edge_properties[edge] = {weight_name: wt, label_name: label}
+
+    def _add_missing_node(self, node):
+        if node not in self.node_neighbors:
+            self.node_neighbors[node] = {}
+            self.node_incidence[node] = {}
+            self.node_attr[node] = []
+
+
+    @classmethod
+    def from_edges(cls, edges, nodes = None, compact = False):
+        """
+        Build a digraph from weighted edges in one pass, see add_edges_bulk.
+
+        @type  edges: iterable
+        @param edges: Edges given as (u, v, weight) tuples.
+        
+        @type  nodes: iterable
+        @param nodes: Nodes to add first, in this order, so that nodes without edges are kept.
+        
+        @type  compact: boolean
+        @param compact: Keep edge weights in a typed array.
+
+        @rtype:  digraph
+        @return: The new digraph.
+        """
+        graph = cls(compact)
+        if nodes is not None:
+            graph.add_nodes(nodes)
+        graph.add_edges_bulk(edges)
+        return graph
+
+
+    @classmethod
+    def from_adjacency_file(cls, file_name, compact = False):
+        """
+        Load a digraph from an adjacency file like the ones generator.py writes: per line a JSON node,
+        a tab and a JSON list of [neighbor, weight] pairs.
+
+        @type  file_name: string
+        @param file_name: Path of the adjacency file.
+        
+        @type  compact: boolean
+        @param compact: Keep edge weights in a typed array.
+
+        @rtype:  digraph
+        @return: The new digraph.
+        """
+        graph = cls(compact)
+        
+        def edges(adjacency_file):
+            for line in adjacency_file:
+                node, adjacency = line.split("\t", 1)
+                u = json.loads(node)
+                # Nodes with no edges have a line too
+                if u not in graph.node_neighbors:
+                    graph.add_node(u)
+                for v, wt in json.loads(adjacency):
+                    yield (u, v, wt)
+        
+        adjacency_file = open(file_name, "r")
+        graph.add_edges_bulk(edges(adjacency_file))
+        adjacency_file.close()
+        return graph
+
+
+    def copy(self):
+        """
+        Return a copy of the digraph with its weights, labels and attributes.
+        
+        The internal tables are cloned in bulk instead of adding the nodes and edges one by one.
+
+        @rtype:  digraph
+        @return: The copy.
+        """
+        graph = digraph(self.compact)
+        graph.node_neighbors = dict((node, dict(neighbors)) for node, neighbors in self.node_neighbors.items())
+        graph.node_incidence = dict((node, dict(incidents)) for node, incidents in self.node_incidence.items())
+        graph.node_attr = dict((node, list(attrs)) for node, attrs in self.node_attr.items())
+        graph.edge_properties = dict((edge, dict(properties)) for edge, properties in self.edge_properties.items())
+        graph.edge_attr = dict((edge, list(attrs)) for edge, attrs in self.edge_attr.items())
+        if self.compact:
+            graph.edge_slot = dict(self.edge_slot)
+            graph.edge_weights = self.edge_weights[:]
+            graph.free_slots = list(self.free_slots)
+        return graph
+
+
+    def snapshot(self):
+        """
+        Return a copy-on-write snapshot of the digraph, see digraph_snapshot.
+
+        @rtype:  digraph_snapshot
+        @return: The snapshot.
+        """
+        return digraph_snapshot(self)
+
+
     def del_node(self, node):
         """
         Remove a node from the graph.
@@ -186,11 +332,11 @@ class digraph (basegraph, common, labeling):
         @type  node: node
         @param node: Node identifier.
         """
-        for each in list(self.incidents(node)):
+        for each in self.incidents(node):
             # Delete all the edges incident on this node
             self.del_edge((each, node))
             
-        for each in list(self.neighbors(node)):
+        for each in self.neighbors(node):
             # Delete all the edges pointing to this node.
             self.del_edge((node, each))
         
@@ -210,8 +356,8 @@ class digraph (basegraph, common, labeling):
         @param edge: Edge.
         """
         u, v = edge
-        self.node_neighbors[u].remove(v)
-        self.node_incidence[v].remove(u)
+        del(self.node_neighbors[u][v])
+        del(self.node_incidence[v][u])
         self.del_edge_labeling( (u,v) )
 
 
@@ -226,7 +372,7 @@ class digraph (basegraph, common, labeling):
         @return: Truth-value for edge existence.
         """
         u, v = edge
-        return (u, v) in self.edge_properties
+        return u in self.node_neighbors and v in self.node_neighbors[u]
 
     
     def node_order(self, node):
@@ -236,7 +382,7 @@ class digraph (basegraph, common, labeling):
         @rtype:  number
         @return: Order of the given node.
         """
-        return len(self.neighbors(node))
+        return len(self.node_neighbors[node])
 
     def __eq__(self, other):
         """
@@ -261,3 +407,118 @@ class digraph (basegraph, common, labeling):
         @return: Whether this graph and the other are different.
         """
         return not (self == other)
+
+
+class digraph_snapshot (digraph):
+    """
+    Copy-on-write snapshot of a digraph.
+    
+    The snapshot starts out sharing the adjacency of every node with the original digraph and copies
+    the adjacency of a node the first time one of its edges is added or deleted. It only stores the
+    properties and attributes of edges set after it was taken, all other reads fall through to the
+    original, so taking a snapshot and changing k edges costs O(V) for the node tables plus O(k),
+    not O(E). The original must not change while the snapshot is in use.
+
+    @sort: __init__, add_edge, add_edges_bulk, add_node, copy, del_edge, edge_attributes, edge_label,
+    edge_weight, get_edge_properties
+    """
+
+    def __init__(self, original = None):
+        """
+        Initialize a snapshot of a digraph.
+
+        @type  original: digraph
+        @param original: Digraph to take the snapshot of, an empty one if not given.
+        """
+        digraph.__init__(self)
+        if original is None:
+            original = digraph()
+        self.original = original
+        self.node_neighbors = dict(original.node_neighbors)
+        self.node_incidence = dict(original.node_incidence)
+        self.node_attr = dict(original.node_attr)
+        self.owned = set()      # Nodes whose adjacency was copied from the original
+        self.deleted = set()    # Edges of the original that were deleted, even if added again
+
+    def _own(self, node):
+        if node not in self.owned and node in self.node_neighbors:
+            self.node_neighbors[node] = dict(self.node_neighbors[node])
+            self.node_incidence[node] = dict(self.node_incidence[node])
+            self.owned.add(node)
+
+    def add_node(self, node, attrs = None):
+        digraph.add_node(self, node, attrs)
+        self.owned.add(node)
+
+    def add_edge(self, edge, wt = 1, label="", attrs = []):
+        self._own(edge[0])
+        self._own(edge[1])
+        digraph.add_edge(self, edge, wt, label, attrs)
+
+    def add_edges_bulk(self, edges):
+        def owned(edges):
+            for u, v, wt in edges:
+                self._own(u)
+                self._own(v)
+                yield (u, v, wt)
+        digraph.add_edges_bulk(self, owned(edges))
+
+    def del_edge(self, edge):
+        self._own(edge[0])
+        self._own(edge[1])
+        digraph.del_edge(self, edge)
+        self.deleted.add(edge)
+
+    def _inherits(self, edge):
+        # Properties of an edge come from the original until the edge is deleted here,
+        # an edge added again after that starts over with only its new properties
+        return edge not in self.deleted
+
+    def edge_weight(self, edge):
+        properties = self.edge_properties.get( edge )
+        if properties is not None and self.WEIGHT_ATTRIBUTE_NAME in properties:
+            return properties[self.WEIGHT_ATTRIBUTE_NAME]
+        if self._inherits(edge):
+            return self.original.edge_weight(edge)
+        return self.DEFAULT_WEIGHT
+
+    def edge_label(self, edge):
+        properties = self.edge_properties.get( edge )
+        if properties is not None and self.LABEL_ATTRIBUTE_NAME in properties:
+            return properties[self.LABEL_ATTRIBUTE_NAME]
+        if self._inherits(edge):
+            return self.original.edge_label(edge)
+        return self.DEFAULT_LABEL
+
+    def edge_attributes(self, edge):
+        if edge in self.edge_attr:
+            return self.edge_attr[edge]
+        if self._inherits(edge):
+            return self.original.edge_attributes(edge)
+        return []
+
+    def get_edge_properties(self, edge):
+        properties = {}
+        if self._inherits(edge) and self.original.has_edge(edge):
+            properties[self.WEIGHT_ATTRIBUTE_NAME] = self.original.edge_weight(edge)
+            properties[self.LABEL_ATTRIBUTE_NAME] = self.original.edge_label(edge)
+        properties.update(self.edge_properties.get( edge, {} ))
+        return properties
+
+    def copy(self):
+        """
+        Return a plain digraph with the current nodes, weights, labels and attributes of the snapshot.
+
+        @rtype:  digraph
+        @return: The copy.
+        """
+        graph = digraph()
+        for node in self.nodes():
+            graph.add_node(node, list(self.node_attributes(node)))
+        graph.add_edges_bulk((u, v, self.edge_weight((u, v))) for u, v in self._edges())
+        for edge in graph.edges():
+            label = self.edge_label(edge)
+            if label != self.DEFAULT_LABEL:
+                graph.set_edge_label(edge, label)
+            graph.add_edge_attributes(edge, self.edge_attributes(edge))
+        return graph
@@ -23,6 +23,10 @@
 # OTHER DEALINGS IN THE SOFTWARE.
 
 
+# Imports
+from array import array
+
+
 class labeling( object ):
     """
     Generic labeling support for graphs
@@ -37,11 +41,19 @@ class labeling( object ):
     LABEL_ATTRIBUTE_NAME = "label"
     DEFAULT_LABEL = ""
     
-    def __init__(self):
+    def __init__(self, compact = False):
         # Metadata bout edges
         self.edge_properties = {}    # Mapping: Edge -> Dict mapping, lablel-> str, wt->num
         self.edge_attr = {}          # Key value pairs: (Edge -> Attributes)
         
+        # Compact storage keeps the weights in a typed array indexed by an edge slot,
+        # edge_properties then only holds the labels and other properties that were set
+        self.compact = compact
+        if compact:
+            self.edge_slot = {}             # Mapping: Edge -> Slot in edge_weights
+            self.edge_weights = array('d')  # Weight of each slot
+            self.free_slots = []            # Slots of deleted edges, reused first
+        
         # Metadata bout nodes
         self.node_attr = {}          # Pairing: Node -> Attributes
         
@@ -57,6 +69,10 @@ class labeling( object ):
             keys.append(edge[::-1])
             
         for key in keys:
+            if self.compact:
+                slot = self.edge_slot.pop(key, None)
+                if slot is not None:
+                    self.free_slots.append(slot)
             for mapping in [self.edge_properties, self.edge_attr ]:
                 try:
                     del ( mapping[key] )
@@ -73,7 +89,15 @@ class labeling( object ):
         @rtype:  number
         @return: Edge weight.
         """
-        return self.get_edge_properties( edge ).setdefault( self.WEIGHT_ATTRIBUTE_NAME, self.DEFAULT_WEIGHT )
+        if self.compact:
+            slot = self.edge_slot.get( edge )
+            if slot is None:
+                return self.DEFAULT_WEIGHT
+            return self.edge_weights[slot]
+        properties = self.edge_properties.get( edge )
+        if properties is None:
+            return self.DEFAULT_WEIGHT
+        return properties.get( self.WEIGHT_ATTRIBUTE_NAME, self.DEFAULT_WEIGHT )
 
 
     def set_edge_weight(self, edge, wt):
@@ -101,7 +125,10 @@ class labeling( object ):
         @rtype:  string
         @return: Edge label
         """
-        return self.get_edge_properties( edge ).setdefault( self.LABEL_ATTRIBUTE_NAME, self.DEFAULT_LABEL )
+        properties = self.edge_properties.get( edge )
+        if properties is None:
+            return self.DEFAULT_LABEL
+        return properties.get( self.LABEL_ATTRIBUTE_NAME, self.DEFAULT_LABEL )
 
     def set_edge_label(self, edge, label):
         """
@@ -118,11 +145,47 @@ class labeling( object ):
             self.set_edge_properties((edge[1], edge[0]) , label=label )
             
     def set_edge_properties(self, edge, **properties ):
+        if self.compact:
+            self._set_compact_properties( edge, dict( properties ) )
+            if (not self.DIRECTED and edge[0] != edge[1]):
+                self._set_compact_properties( (edge[1], edge[0]), dict( properties ) )
+            return
         self.edge_properties.setdefault( edge, {} ).update( properties )
         if (not self.DIRECTED and edge[0] != edge[1]):
             self.edge_properties.setdefault((edge[1], edge[0]), {}).update( properties )
+    
+    def _set_compact_properties(self, edge, properties):
+        if self.WEIGHT_ATTRIBUTE_NAME in properties:
+            wt = properties.pop( self.WEIGHT_ATTRIBUTE_NAME )
+            slot = self.edge_slot.get( edge )
+            if slot is None:
+                if self.free_slots:
+                    slot = self.free_slots.pop()
+                else:
+                    slot = len( self.edge_weights )
+                    self.edge_weights.append( 0 )
+                self.edge_slot[edge] = slot
+            self.edge_weights[slot] = wt
+        
+        # A default label is not stored, and clears a label set before
+        if properties.get( self.LABEL_ATTRIBUTE_NAME ) == self.DEFAULT_LABEL:
+            del( properties[self.LABEL_ATTRIBUTE_NAME] )
+            stored = self.edge_properties.get( edge )
+            if stored is not None:
+                stored.pop( self.LABEL_ATTRIBUTE_NAME, None )
+                if not stored:
+                    del( self.edge_properties[edge] )
+        if properties:
+            self.edge_properties.setdefault( edge, {} ).update( properties )
         
     def get_edge_properties(self, edge):
+        if self.compact:
+            # Built on request, the weight does not live in a dict
+            properties = dict( self.edge_properties.get( edge, {} ) )
+            slot = self.edge_slot.get( edge )
+            if slot is not None:
+                properties[self.WEIGHT_ATTRIBUTE_NAME] = self.edge_weights[slot]
+            return properties
         return self.edge_properties.setdefault( edge, {} )
             
     def add_edge_attribute(self, edge, attr):
@@ -35,10 +35,12 @@ Minimization and maximization algorithms.
 shortest_path_bellman_ford
 """
 
-from utils import heappush, heappop
+from python_graph.utils import heappush, heappop
 
-import exceptions
-from digraph import digraph
+import python_graph.exceptions
+from python_graph.digraph import digraph
+from python_graph.csr import csr_graph
+from collections import deque
 import bisect
 
 # Minimal spanning tree
@@ -409,6 +411,288 @@ def maximum_flow(graph, source, sink, caps = None):
             cut[node] = 0
     return (f,cut)
 
+class _residual_network(object):
+    """
+    Residual arcs of a digraph, or of a csr_graph, for the Dinic and push-relabel algorithms.
+
+    The arcs live in flat lists, arc a goes from its tail to head[a] with residual[a] left, rev[a] is
+    the arc going the other way and arcs[v] holds the arcs leaving node index v.
+    """
+
+    def __init__(self, graph, source, sink, caps):
+        if isinstance(graph, csr_graph):
+            #the csr graph keeps its own capacities and flow, BFS runs on its arrays
+            self.csr = graph
+            self.nodes = graph.nodes
+            self.head, self.residual, self.rev, self.arcs = graph.arc_lists()
+            index = graph.index
+        else:
+            #handle optional argument, if weights are available, use them, if not, assume one
+            if caps == None:
+                caps = {}
+                for edge in graph.edges():
+                    caps[edge] = graph.edge_weight((edge[0],edge[1]))
+
+            #arc 2*i goes along the i-th edge and arc 2*i+1 goes back
+            self.csr = None
+            self.nodes = graph.nodes()
+            index = {}
+            for i in range(len(self.nodes)):
+                index[self.nodes[i]] = i
+            self.edges = graph.edges()
+            self.head = []
+            self.residual = []
+            self.arcs = [[] for node in self.nodes]
+            for edge in self.edges:
+                u = index[edge[0]]
+                v = index[edge[1]]
+                self.arcs[u].append(len(self.head))
+                self.head.append(v)
+                self.residual.append(caps[edge])
+                self.arcs[v].append(len(self.head))
+                self.head.append(u)
+                self.residual.append(0)
+            self.rev = [a ^ 1 for a in range(len(self.head))]
+
+        self.n = len(self.nodes)
+        self.s = index[source]
+        self.t = index[sink]
+
+    def levels(self, root, backward = False):
+        """
+        Return the BFS distance of each node from the root over arcs with residual capacity,
+        or to the root when backward, -1 for the nodes not found.
+        """
+        if self.csr is not None:
+            return self.csr.levels(root, self.residual, backward).tolist()
+
+        head = self.head
+        residual = self.residual
+        rev = self.rev
+        level = [-1] * self.n
+        level[root] = 0
+        q = deque([root])
+        while q:
+            v = q.popleft()
+            for a in self.arcs[v]:
+                w = head[a]
+                if level[w] < 0 and residual[rev[a] if backward else a] > 0:
+                    level[w] = level[v] + 1
+                    q.append(w)
+        return level
+
+    def flow_and_cut(self):
+        """
+        Return the flow of each edge and the component of each node in the cut the source side reaches.
+        """
+        if self.csr is not None:
+            self.csr.set_residual(self.residual)
+            return self.csr.flow_and_cut(self.nodes[self.s])
+
+        #the flow of an edge is the residual of its backward arc
+        f = {}
+        for i in range(len(self.edges)):
+            f[self.edges[i]] = self.residual[2*i + 1]
+
+        cut = {}
+        level = self.levels(self.s)
+        for i in range(self.n):
+            if level[i] >= 0:
+                cut[self.nodes[i]] = 0
+            else:
+                cut[self.nodes[i]] = 1
+        return (f,cut)
+
+def maximum_flow_push_relabel(graph, source, sink, caps = None):
+    """
+    Find a maximum flow and minimum cut of a directed graph by the FIFO push-relabel algorithm,
+    with the gap heuristic and periodic global relabeling.
+
+    @type graph: digraph, csr_graph
+    @param graph: Graph, a csr_graph keeps its own capacities and is left holding the flow
+
+    @type source: node
+    @param source: Source of the flow
+
+    @type sink: node
+    @param sink: Sink of the flow
+
+    @type caps: dictionary
+    @param caps: Dictionary specifying a maximum capacity for each edge. If not given, the weight of the edge
+    will be used as its capacity. Otherwise, for each edge (a,b), caps[(a,b)] should be given.
+    
+    @rtype: tuple
+    @return: A tuple containing two dictionaries
+        1. contains the flow through each edge for a maximal flow through the graph
+        2. contains to which component of a minimum cut each node belongs
+    """
+
+    network = _residual_network(graph, source, sink, caps)
+    head = network.head
+    residual = network.residual
+    rev = network.rev
+    arcs = network.arcs
+    n = network.n
+    s = network.s
+    t = network.t
+
+    #heights run from 0 to 2n, nodes at 2n reach neither the sink nor the source
+    excess = [0] * n
+    height = [0] * n
+    count = [0] * (2*n + 1)
+    current = [0] * n
+    queued = [False] * n
+    active = deque()
+
+    def global_relabel():
+        #heights become residual distances to the sink, or n plus the distance to the source
+        to_sink = network.levels(t, backward=True)
+        to_source = network.levels(s, backward=True)
+        for i in range(n):
+            if to_sink[i] >= 0:
+                height[i] = to_sink[i]
+            elif to_source[i] >= 0:
+                height[i] = n + to_source[i]
+            else:
+                height[i] = 2*n
+        height[s] = n
+        for h in range(2*n + 1):
+            count[h] = 0
+        for i in range(n):
+            count[height[i]] += 1
+            current[i] = 0
+
+    def push(a, v, w, delta):
+        residual[a] -= delta
+        residual[rev[a]] += delta
+        excess[v] -= delta
+        excess[w] += delta
+        if not queued[w] and w != s and w != t:
+            queued[w] = True
+            active.append(w)
+
+    #saturate the edges out of the source, an infinite edge only needs to carry every finite capacity
+    bound = sum(r for r in residual if r != float('Inf'))
+    for a in arcs[s]:
+        if residual[a] > 0:
+            push(a, s, head[a], min(residual[a], bound))
+    global_relabel()
+
+    relabels = 0
+    while active:
+        v = active.popleft()
+        queued[v] = False
+
+        #discharge v
+        while excess[v] > 0:
+            if current[v] == len(arcs[v]):
+                old = height[v]
+                new = 2*n
+                for a in arcs[v]:
+                    if residual[a] > 0 and height[head[a]] + 1 < new:
+                        new = height[head[a]] + 1
+                count[old] -= 1
+                height[v] = new
+                count[new] += 1
+                current[v] = 0
+                relabels += 1
+
+                #gap: nothing is left at height old, the nodes above it cannot reach the sink
+                if count[old] == 0 and old < n:
+                    for w in range(n):
+                        if old < height[w] < n:
+                            count[height[w]] -= 1
+                            height[w] = n + 1
+                            count[n + 1] += 1
+                            current[w] = 0
+                continue
+
+            a = arcs[v][current[v]]
+            w = head[a]
+            if residual[a] > 0 and height[v] == height[w] + 1:
+                push(a, v, w, min(excess[v], residual[a]))
+            else:
+                current[v] += 1
+
+        if relabels >= n:
+            global_relabel()
+            relabels = 0
+
+    return network.flow_and_cut()
+
+def maximum_flow_dinic(graph, source, sink, caps = None):
+    """
+    Find a maximum flow and minimum cut of a directed graph by Dinic's algorithm, with blocking flows
+    found by a current-arc depth first search over the BFS level graph.
+
+    @type graph: digraph, csr_graph
+    @param graph: Graph, a csr_graph keeps its own capacities and is left holding the flow
+
+    @type source: node
+    @param source: Source of the flow
+
+    @type sink: node
+    @param sink: Sink of the flow
+
+    @type caps: dictionary
+    @param caps: Dictionary specifying a maximum capacity for each edge. If not given, the weight of the edge
+    will be used as its capacity. Otherwise, for each edge (a,b), caps[(a,b)] should be given.
+    
+    @rtype: tuple
+    @return: A tuple containing two dictionaries
+        1. contains the flow through each edge for a maximal flow through the graph
+        2. contains to which component of a minimum cut each node belongs
+    """
+
+    network = _residual_network(graph, source, sink, caps)
+    head = network.head
+    residual = network.residual
+    rev = network.rev
+    arcs = network.arcs
+    s = network.s
+    t = network.t
+
+    while True:
+        #level graph: residual distances from the source
+        level = network.levels(s)
+        if level[t] < 0:
+            break
+
+        #blocking flow, current[v] is the first arc of v that may still lead to the sink
+        current = [0] * network.n
+        path = []
+        v = s
+        while True:
+            if v == t:
+                delta = min(residual[a] for a in path)
+                for a in path:
+                    residual[a] -= delta
+                    residual[rev[a]] += delta
+                #continue from the tail of the first arc the path saturated
+                k = 0
+                while k < len(path) - 1 and residual[path[k]] > 0:
+                    k += 1
+                v = head[rev[path[k]]]
+                del path[k:]
+                continue
+
+            arcs_v = arcs[v]
+            i = current[v]
+            while i < len(arcs_v) and not (residual[arcs_v[i]] > 0 and level[head[arcs_v[i]]] == level[v] + 1):
+                i += 1
+            current[v] = i
+            if i < len(arcs_v):
+                path.append(arcs_v[i])
+                v = head[arcs_v[i]]
+            elif v == s:
+                break
+            else:
+                #dead end, no later path of this phase goes through v
+                level[v] = -1
+                v = head[rev[path.pop()]]
+
+    return network.flow_and_cut()
+
 def cut_value(graph, flow, cut):
     """
     Calculate the value of a cut.
@@ -33,7 +33,7 @@ Search algorithms.
 import sys
 sys.path.append('../python_graph')
 from python_graph.null import null
-from sys import getrecursionlimit, setrecursionlimit
+from collections import deque
 
 
 # Depth-first search
@@ -55,21 +55,32 @@ def depth_first_search(graph, root=None, filter=null()):
         3. Graph's postordering
     """
     
-    recursionlimit = getrecursionlimit()
-    setrecursionlimit(max(len(graph.nodes())*2,recursionlimit))
+    # The null filter accepts every node, so it is not called for each edge
+    filtered = type(filter) is not null
 
     def dfs(node):
         """
         Depth-first search subfunction.
+        
+        Keeps an explicit stack of neighbor iterators instead of recursing, so deep graphs
+        do not hit the recursion limit.
         """
         visited[node] = 1
         pre.append(node)
-        # Explore recursively the connected component
-        for each in graph[node]:
-            if (each not in visited and filter(each, node)):
-                spanning_tree[each] = node
-                dfs(each)
-        post.append(node)
+        stack = [(node, iter(graph.neighbors(node)))]
+        while stack:
+            node, neighbors = stack[-1]
+            # Resume the neighbors of the node on top, descend into the first unvisited one
+            for each in neighbors:
+                if (each not in visited and (not filtered or filter(each, node))):
+                    spanning_tree[each] = node
+                    visited[each] = 1
+                    pre.append(each)
+                    stack.append((each, iter(graph.neighbors(each))))
+                    break
+            else:
+                stack.pop()
+                post.append(node)
 
     visited = {}            # List for marking visited and non-visited nodes
     spanning_tree = {}      # Spanning tree
@@ -82,7 +93,6 @@ def depth_first_search(graph, root=None, filter=null()):
         if filter(root, None):
             spanning_tree[root] = None
             dfs(root)
-        setrecursionlimit(recursionlimit)
         return spanning_tree, pre, post
     
     # Algorithm loop
@@ -93,8 +103,6 @@ def depth_first_search(graph, root=None, filter=null()):
             # Explore node's connected component
             dfs(each)
 
-    setrecursionlimit(recursionlimit)
-    
     return (spanning_tree, pre, post)
 
 
@@ -116,20 +124,23 @@ def breadth_first_search(graph, root=None, filter=null()):
         2. Graph's level-based ordering
     """
 
+    # The null filter accepts every node, so it is not called for each edge
+    filtered = type(filter) is not null
+
     def bfs():
         """
         Breadth-first search subfunction.
         """
-        while (queue != []):
-            node = queue.pop(0)
+        while queue:
+            node = queue.popleft()
             
-            for other in graph[node]:
-                if (other not in spanning_tree and filter(other, node)):
+            for other in graph.neighbors(node):
+                if (other not in spanning_tree and (not filtered or filter(other, node))):
                     queue.append(other)
                     ordering.append(other)
                     spanning_tree[other] = node
     
-    queue = []            # Visiting queue
+    queue = deque()       # Visiting queue
     spanning_tree = {}    # Spanning tree
     ordering = []
     filter.configure(graph, spanning_tree)
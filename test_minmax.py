@@ -0,0 +1,67 @@
+import random
+import unittest
+
+from python_graph import csr, minmax
+from python_graph.digraph import digraph
+
+### Cross-check of the single node max-flow solvers ###
+# Push-relabel and Dinic, on digraphs and on csr graphs, must find the same
+# max flow and the same minimum cut as Edmonds-Karp on small random graphs.
+
+SOURCE, SINK = 0, 1
+TRIALS = 200
+
+# a random digraph of 2 to 12 nodes, every third one with float and infinite capacities
+def random_graph(rng, trial):
+    n = rng.randint(2, 12)
+    graph = digraph()
+    graph.add_nodes(range(n))
+    for u in range(n):
+        for v in range(n):
+            if u != v and rng.random() < 0.3:
+                if trial % 3 == 0:
+                    weight = rng.choice([1, 2, 3, 0.5, 7, 100, float("inf")])
+                else:
+                    weight = rng.randint(1, 9)
+                graph.add_edge((u, v), wt=weight)
+    return graph
+
+# value of the cut and its source side
+def cut_of(graph, flow, cut):
+    return minmax.cut_value(graph, flow, cut), sorted(node for node in cut if cut[node] == 0)
+
+class MaximumFlowTest(unittest.TestCase):
+    def assert_feasible(self, graph, flow):
+        for edge, edge_flow in flow.items():
+            self.assertGreaterEqual(edge_flow, -1e-9)
+            self.assertLessEqual(edge_flow, graph.edge_weight(edge))
+        for node in graph.nodes():
+            if node in (SOURCE, SINK):
+                continue
+            inflow = sum(flow[(tail, node)] for tail in graph.incidents(node))
+            outflow = sum(flow[(node, head)] for head in graph.neighbors(node))
+            self.assertAlmostEqual(inflow, outflow)
+
+    def check_solvers(self, seed, make_input):
+        rng = random.Random(seed)
+        for trial in range(TRIALS):
+            graph = random_graph(rng, trial)
+            expected = cut_of(graph, *minmax.maximum_flow(graph, SOURCE, SINK))
+            # an infinite max flow has no single answer to compare
+            if expected[0] == float("inf"):
+                continue
+
+            for solver in (minmax.maximum_flow_push_relabel, minmax.maximum_flow_dinic):
+                flow, cut = solver(make_input(graph), SOURCE, SINK)
+                self.assert_feasible(graph, flow)
+                self.assertEqual(cut_of(graph, flow, cut), expected, "%s, trial %d" % (solver.__name__, trial))
+
+    def test_digraph(self):
+        self.check_solvers(1, lambda graph: graph)
+
+    @unittest.skipIf(csr.numpy is None, "csr graphs need numpy")
+    def test_csr_graph(self):
+        self.check_solvers(2, csr.csr_graph)
+
+if __name__ == '__main__':
+    unittest.main()